@@ -200,7 +200,8 @@ def generate(ctx, prompt: str, base_model: str, model: str, reference_images: tu
             height=height,
             steps=steps,
             reference_images=list(reference_images) if reference_images else None,
-            fine_tuned_model=fine_tuned_model
+            fine_tuned_model=fine_tuned_model,
+            verbose=bool(ctx.obj.get('verbose'))
         )
         
         # Generate images through registry
@@ -212,15 +213,13 @@ def generate(ctx, prompt: str, base_model: str, model: str, reference_images: tu
             if result.generation_time:
                 click.echo(f"⏱️  Generation time: {result.generation_time:.1f}s")
             
-            # Save images locally
-            saved_paths = []
-            for i, image_data in enumerate(result.images):
-                image_url = image_data.get('url')
-                if image_url:
-                    filename = f"{model_name}_{storage.get_timestamp()}_{i+1}.jpg"
-                    saved_path = storage.save_generated_image(image_url, filename)
-                    saved_paths.append(saved_path)
-                    click.echo(f"Saved: {saved_path}")
+            # Save images locally, downloading them concurrently
+            timestamp = storage.get_timestamp()
+            downloads = [(image_data['url'], f"{model_name}_{timestamp}_{i+1}.jpg")
+                         for i, image_data in enumerate(result.images) if image_data.get('url')]
+            saved_paths = storage.save_generated_images(downloads)
+            for saved_path in saved_paths:
+                click.echo(f"Saved: {saved_path}")
             
             # Log to database
             db = get_service(DatabaseManager)
@@ -589,22 +588,12 @@ def open_generation(ctx, generation_id: int, index: int):
             return
         
         # Open with system default application
-        import subprocess
-        import platform
+        from .ui_components import open_image_externally
         
-        system = platform.system()
-        try:
-            if system == "Darwin":  # macOS
-                subprocess.run(["open", str(image_path)])
-            elif system == "Windows":
-                subprocess.run(["start", str(image_path)], shell=True)
-            else:  # Linux
-                subprocess.run(["xdg-open", str(image_path)])
-            
+        if open_image_externally(str(image_path)):
             click.echo(f"Opening: {image_path.name}")
-            
-        except Exception as e:
-            click.echo(f"❌ Error opening image: {e}")
+        else:
+            click.echo("❌ Error opening image")
             click.echo(f"Image location: {image_path}")
             
     except Exception as e:
@@ -678,10 +667,10 @@ def browse_history(ctx):
     """
     try:
         from .tui import run_history_browser
-        run_history_browser()
+        run_history_browser(get_service(DatabaseManager))
     except ImportError as e:
         click.echo("❌ TUI dependencies not installed.")
-        click.echo("Install with: pip install textual fuzzywuzzy python-levenshtein")
+        click.echo("Install with: pip install textual rapidfuzz")
     except Exception as e:
         click.echo(f"❌ Error launching TUI: {e}")
 
@@ -701,7 +690,7 @@ def split_editor(ctx):
     """
     try:
         from .split_editor_ui import run_split_editor
-        run_split_editor()
+        run_split_editor(get_service(DatabaseManager))
     except ImportError as e:
         click.echo("❌ TUI dependencies not installed.")
         click.echo("Install with: pip install textual")
@@ -728,7 +717,7 @@ def session_editor(ctx):
     
     try:
         from .session_editor_ui import run_session_editor
-        run_session_editor(fal, storage)
+        run_session_editor(fal, storage, get_service(DatabaseManager))
     except ImportError as e:
         click.echo("❌ TUI dependencies not installed.")
         click.echo("Install with: pip install textual")
@@ -763,7 +752,7 @@ def editor_command(ctx, image_path):
         
         try:
             from .session_editor_ui import run_session_editor_with_image
-            run_session_editor_with_image(fal, storage, image_path)
+            run_session_editor_with_image(fal, storage, image_path, get_service(DatabaseManager))
         except ImportError as e:
             click.echo("❌ TUI dependencies not installed.")
             click.echo("Install with: pip install textual")
@@ -773,7 +762,7 @@ def editor_command(ctx, image_path):
         # Browse generation history
         try:
             from .split_editor_ui import run_split_editor
-            run_split_editor()
+            run_split_editor(get_service(DatabaseManager))
         except ImportError as e:
             click.echo("❌ TUI dependencies not installed.")
             click.echo("Install with: pip install textual")
@@ -17,6 +17,9 @@ class Config:
         # API configuration
         self.fal_key = os.getenv('FAL_KEY')
         
+        # Reuse results of near-duplicate prompts instead of regenerating (opt-in)
+        self.enable_semantic_cache = os.getenv('SEMANTIC_CACHE', '').lower() in ('1', 'true', 'yes')
+        
         # Storage configuration
         self.storage_dir = self.project_root / 'data'
         self.models_dir = self.storage_dir / 'models'
@@ -1,24 +1,43 @@
 """Database manager for tracking generation history"""
 import sqlite3
 import json
+import os
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Sequence, Tuple
 from .config import Config
 from .services import get_service
 
 
+# Prompt characters fetched for list views - enough for any list row
+PREVIEW_PROMPT_LENGTH = 60
+
+# Generation columns with the prompt truncated, so list views don't pull long prompts
+_PREVIEW_COLUMNS = (
+    f"id, timestamp, SUBSTR(prompt, 1, {PREVIEW_PROMPT_LENGTH}) AS prompt, base_model, "
+    "finetuned_model, steps, image_size, num_images, seed, image_paths, image_urls, "
+    "generation_time, success, error_message, metadata"
+)
+
+
 class DatabaseManager:
     """Manages SQLite database for generation history"""
     
     def __init__(self) -> None:
         self.config = get_service(Config)
         self.db_path: Path = self.config.storage_dir / 'generations.db'
+        self._reader_conn: Optional[sqlite3.Connection] = None
+        self._reader_lock = threading.Lock()
         self._init_database()
     
     def _init_database(self) -> None:
         """Initialize database and create tables if they don't exist"""
         with sqlite3.connect(self.db_path) as conn:
+            # Write-ahead logging lets readers and the writer proceed concurrently (persists in the file)
+            conn.execute("PRAGMA journal_mode=WAL")
+            
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS generations (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -90,6 +109,57 @@ class DatabaseManager:
             conn.execute("""
                 CREATE INDEX IF NOT EXISTS idx_session_step ON session_steps(session_id, step_number)
             """)
+            
+            # Cache of uploaded file URLs keyed by content hash
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS uploads (
+                    content_hash TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    uploaded_at REAL NOT NULL
+                )
+            """)
+            
+            # Content hashes of local files, so unchanged files needn't be re-hashed
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS file_hashes (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL
+                )
+            """)
+    
+    def _read(self, query: str, params: Sequence[Any] = ()) -> List[sqlite3.Row]:
+        """Run a read query on the shared long-lived read connection
+        
+        List views re-run the same queries on every refresh, each from a fresh
+        worker thread; one connection shared across threads keeps its page cache
+        and prepared statements warm between calls. The lock serializes its use.
+        """
+        with self._reader_lock:
+            if self._reader_conn is None:
+                conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                conn.row_factory = sqlite3.Row
+                conn.execute("PRAGMA cache_size=-20000")
+                conn.execute("PRAGMA mmap_size=268435456")
+                self._reader_conn = conn
+            return self._reader_conn.execute(query, params).fetchall()
+    
+    def data_version(self) -> Tuple[int, ...]:
+        """Cheap marker that changes whenever the database is written
+        
+        Uses the modification times and sizes of the database and its write-ahead
+        log instead of PRAGMA data_version, which only tracks other connections'
+        writes and so means nothing across the short-lived connections used here.
+        """
+        marker: List[int] = []
+        for path in (self.db_path, self.db_path.with_name(self.db_path.name + '-wal')):
+            try:
+                stat = os.stat(path)
+                marker += [stat.st_mtime_ns, stat.st_size]
+            except OSError:
+                marker += [0, 0]
+        return tuple(marker)
     
     def log_generation(
         self,
@@ -163,7 +233,8 @@ class DatabaseManager:
         finetuned_model: Optional[str] = None,
         success_only: bool = True,
         limit: int = 50,
-        offset: int = 0
+        offset: int = 0,
+        preview: bool = False
     ) -> List[Dict[str, Any]]:
         """Search generation history
         
@@ -174,11 +245,14 @@ class DatabaseManager:
             success_only: Only return successful generations
             limit: Maximum number of results
             offset: Number of results to skip
+            preview: Fetch prompts cut to PREVIEW_PROMPT_LENGTH characters, for list
+                views (fetch the full record with get_generation_by_id)
             
         Returns:
             List of generation records
         """
-        query = "SELECT * FROM generations WHERE 1=1"
+        columns = _PREVIEW_COLUMNS if preview else "*"
+        query = f"SELECT {columns} FROM generations WHERE 1=1"
         params = []
         
         if prompt_search:
@@ -199,37 +273,31 @@ class DatabaseManager:
         query += " ORDER BY timestamp DESC LIMIT ? OFFSET ?"
         params.extend([limit, offset])
         
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row  # Enable dict-like access
-            cursor = conn.execute(query, params)
-            rows = cursor.fetchall()
-            
-            # Convert to list of dicts and parse JSON fields
-            results = []
-            for row in rows:
-                result = dict(row)
-                result['image_paths'] = json.loads(result['image_paths'])
-                result['image_urls'] = json.loads(result['image_urls'])
-                result['metadata'] = json.loads(result['metadata'])
-                results.append(result)
-            
-            return results
+        rows = self._read(query, params)
+        
+        # Convert to list of dicts and parse JSON fields
+        results = []
+        for row in rows:
+            result = dict(row)
+            result['image_paths'] = json.loads(result['image_paths'])
+            result['image_urls'] = json.loads(result['image_urls'])
+            result['metadata'] = json.loads(result['metadata'])
+            results.append(result)
+        
+        return results
     
     def get_generation_by_id(self, generation_id: int) -> Optional[Dict[str, Any]]:
         """Get a specific generation by ID"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.execute("SELECT * FROM generations WHERE id = ?", (generation_id,))
-            row = cursor.fetchone()
-            
-            if row:
-                result = dict(row)
-                result['image_paths'] = json.loads(result['image_paths'])
-                result['image_urls'] = json.loads(result['image_urls'])
-                result['metadata'] = json.loads(result['metadata'])
-                return result
-            
-            return None
+        rows = self._read("SELECT * FROM generations WHERE id = ?", (generation_id,))
+        
+        if rows:
+            result = dict(rows[0])
+            result['image_paths'] = json.loads(result['image_paths'])
+            result['image_urls'] = json.loads(result['image_urls'])
+            result['metadata'] = json.loads(result['metadata'])
+            return result
+        
+        return None
     
     def get_recent_generations(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get the most recent generations"""
@@ -335,12 +403,18 @@ class DatabaseManager:
         """Get all editing sessions"""
         with sqlite3.connect(self.db_path) as conn:
             conn.row_factory = sqlite3.Row
+            # Aggregate the steps once per session (covered by idx_session_id) before
+            # joining, rather than grouping the joined session rows
             cursor = conn.execute("""
-                SELECT s.*, COUNT(ss.id) as step_count,
-                       MAX(ss.timestamp) as last_step_timestamp
+                SELECT s.*, COALESCE(c.step_count, 0) as step_count,
+                       c.last_step_timestamp
                 FROM sessions s
-                LEFT JOIN session_steps ss ON s.id = ss.session_id
-                GROUP BY s.id
+                LEFT JOIN (
+                    SELECT session_id, COUNT(*) as step_count,
+                           MAX(timestamp) as last_step_timestamp
+                    FROM session_steps
+                    GROUP BY session_id
+                ) c ON c.session_id = s.id
                 ORDER BY s.updated_timestamp DESC
             """)
             return [dict(row) for row in cursor.fetchall()]
@@ -359,6 +433,31 @@ class DatabaseManager:
             result = cursor.fetchone()
             return dict(result) if result else None
     
+    def get_session_with_steps(self, session_id: int) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Get a session and all its steps over a single connection
+        
+        Args:
+            session_id: Session ID
+        
+        Returns:
+            Tuple of (session or None if not found, steps ordered by step number)
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            steps = [dict(row) for row in conn.execute("""
+                SELECT * FROM session_steps 
+                WHERE session_id = ? 
+                ORDER BY step_number ASC
+            """, (session_id,))]
+            
+            session = conn.execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if not session:
+                return None, steps
+            
+            session = dict(session)
+            session['step_count'] = len(steps)
+            return session, steps
+    
     def get_session_steps(self, session_id: int) -> List[Dict[str, Any]]:
         """Get all steps for a session"""
         with sqlite3.connect(self.db_path) as conn:
@@ -376,4 +475,66 @@ class DatabaseManager:
             # Delete steps first (foreign key constraint)
             conn.execute("DELETE FROM session_steps WHERE session_id = ?", (session_id,))
             cursor = conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
-            return cursor.rowcount > 0
\ No newline at end of file
+            return cursor.rowcount > 0
+    
+    # Upload cache methods
+    def get_cached_upload(self, content_hash: str, max_age: float) -> Optional[str]:
+        """Get the URL of a previous upload with the same content, if still fresh
+        
+        Args:
+            content_hash: SHA-256 hex digest of the file content
+            max_age: Maximum age of the upload in seconds
+        
+        Returns:
+            Uploaded file URL or None if not cached
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.execute(
+                "SELECT url FROM uploads WHERE content_hash = ? AND uploaded_at >= ?",
+                (content_hash, time.time() - max_age)
+            )
+            result = cursor.fetchone()
+            return result[0] if result else None
+    
+    def cache_upload(self, content_hash: str, url: str, max_age: float) -> None:
+        """Record an uploaded file URL and evict expired uploads
+        
+        Args:
+            content_hash: SHA-256 hex digest of the file content
+            url: URL the file was uploaded to
+            max_age: Uploads older than this many seconds are evicted
+        """
+        now = time.time()
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO uploads (content_hash, url, uploaded_at) VALUES (?, ?, ?)",
+                (content_hash, url, now)
+            )
+            conn.execute("DELETE FROM uploads WHERE uploaded_at < ?", (now - max_age,))
+    
+    def get_file_hash(self, path: str, size: int, mtime_ns: int) -> Optional[str]:
+        """Get the recorded content hash of a file if it hasn't changed since
+        
+        Args:
+            path: Absolute file path
+            size: Current file size in bytes
+            mtime_ns: Current modification time in nanoseconds
+        
+        Returns:
+            SHA-256 hex digest or None if unknown or changed
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.execute(
+                "SELECT content_hash FROM file_hashes WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, size, mtime_ns)
+            )
+            result = cursor.fetchone()
+            return result[0] if result else None
+    
+    def save_file_hash(self, path: str, size: int, mtime_ns: int, content_hash: str) -> None:
+        """Record the content hash of a file at its current size and modification time"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?)",
+                (path, size, mtime_ns, content_hash)
+            )
\ No newline at end of file
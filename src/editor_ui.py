@@ -6,7 +6,7 @@ from typing import List, Optional, Dict
 import subprocess
 from PIL import Image
 import tempfile
-from .image_preview import ImagePreview
+from .image_preview import ImagePreview, grayscale_to_ascii
 
 class IterativeEditor:
     """Terminal UI for iterative image editing"""
@@ -176,30 +176,17 @@ Commands:
     def _image_to_ascii(self, image_path: str, width: int = 60) -> str:
         """Convert image to ASCII art for terminal preview"""
         try:
-            # ASCII characters from dark to light
-            chars = " .:-=+*#%@"
-            
             with Image.open(image_path) as img:
-                # Convert to grayscale and resize
-                img = img.convert('L')
-                
                 # Calculate height to maintain aspect ratio
                 aspect_ratio = img.height / img.width
                 height = int(width * aspect_ratio * 0.55)  # 0.55 to account for character aspect ratio
                 
-                img = img.resize((width, height))
+                # Let JPEG decoding downscale while it decodes, then convert the small image
+                img.draft('L', (width * 2, height * 2))
+                img = img.convert('L').resize((width, height), Image.Resampling.BILINEAR)
                 
                 # Convert to ASCII
-                ascii_lines = []
-                for y in range(height):
-                    line = ""
-                    for x in range(width):
-                        pixel = img.getpixel((x, y))
-                        char_index = int(pixel * (len(chars) - 1) / 255)
-                        line += chars[char_index]
-                    ascii_lines.append(line)
-                
-                return '\n'.join(ascii_lines)
+                return grayscale_to_ascii(img)
                 
         except Exception as e:
             return f"[Preview unavailable: {e}]"
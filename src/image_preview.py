@@ -1,20 +1,162 @@
 """Enhanced image preview system supporting color terminals, external viewers, and ASCII fallback"""
 import os
+import sys
+import json
+import functools
+import hashlib
 import subprocess
 import shutil
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Any, Dict, Optional, Tuple
 from PIL import Image
 import tempfile
 
+# Capability probes are persisted here so they don't rerun on every CLI invocation
+CAPABILITY_CACHE_FILE = Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'banana-portraits' / 'caps.json'
+
+# ASCII characters from dark to light, and a byte table mapping each grayscale level to one
+_ASCII_CHARS = " .:-=+*#%@"
+_ASCII_TABLE = bytes(ord(_ASCII_CHARS[level * (len(_ASCII_CHARS) - 1) // 255]) for level in range(256))
+
+# TERM / TERM_PROGRAM fragments of terminals that render sixel graphics
+_SIXEL_TERMINALS = ('foot', 'mlterm', 'contour', 'sixel')
+
+# String Terminator plus attribute reset - closes a graphics sequence cut off mid-stream
+_ABORT_GRAPHICS = "\x1b\\\x1b[0m\n"
+
+
+@functools.lru_cache(maxsize=None)
+def _which(command: str) -> Optional[str]:
+    """Resolve an executable on PATH, scanning PATH only once per command per process"""
+    return shutil.which(command)
+
+
+@functools.lru_cache(maxsize=256)
+def _image_size(image_path: str, mtime_ns: int) -> Tuple[int, int]:
+    """Read an image's pixel size from its header (keyed on mtime so edits invalidate it)"""
+    with Image.open(image_path) as img:
+        return img.size
+
+
+def _preview_height(image_path: str, width: int, char_aspect: float = 0.5) -> int:
+    """Rows needed to show an image at the given width, allowing for tall terminal cells"""
+    img_width, img_height = _image_size(image_path, os.stat(image_path).st_mtime_ns)
+    return int(width * (img_height / img_width) * char_aspect)
+
+
+def _reduced_copy(image_path: str, width: int, height: int) -> str:
+    """Path of a small PNG copy of a JPEG far larger than the preview, else the image itself
+    
+    chafa's time goes mostly on decoding; JPEG draft mode decodes at a fraction of the
+    size for almost nothing, so chafa is handed pixels close to what it will show.
+    """
+    # Roughly the pixels behind a terminal cell
+    target = (width * 8, height * 16)
+    try:
+        with Image.open(image_path) as img:
+            if img.format != 'JPEG' or img.width <= 2 * target[0]:
+                return image_path
+            img.draft('RGB', target)
+            img = img.convert('RGB')
+        img.thumbnail(target, Image.Resampling.BILINEAR)
+        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp:
+            img.save(tmp, 'PNG', compress_level=1)
+        return tmp.name
+    except Exception:
+        return image_path
+
+
+def grayscale_to_ascii(img: Image.Image) -> str:
+    """Map a grayscale ('L') image to ASCII art, one character per pixel, in one pass over its bytes"""
+    width = img.width
+    ascii_bytes = img.tobytes().translate(_ASCII_TABLE)
+    return '\n'.join(ascii_bytes[y * width:(y + 1) * width].decode('ascii') for y in range(img.height))
+
+
 class ImagePreview:
     """Smart image preview with multiple display methods"""
     
-    def __init__(self):
-        self.terminal_type = self._detect_terminal()
-        self.supports_chafa = self._check_chafa_support()
-        self.supports_external = self._check_external_viewer()
+    def __init__(self, allow_rich: bool = False):
+        # Rich rendering is slow and offers no quality advantage over ASCII, so it's opt-in
+        self.allow_rich = allow_rich
+        self._init_capabilities()
+        
+        # Preview methods in order of preference: (label, is_available, method, success banner)
+        self._methods = (
+            ("Chafa", lambda: self.supports_chafa, self._show_chafa, None),
+            ("Rich display", lambda: self.allow_rich, self._show_rich_image,
+             "─" * 60 + "\n🌈 Displayed using Rich (colored terminal graphics)"),
+            ("External viewer", lambda: self.supports_external, self._show_external_preview,
+             "🖼️ Opened in external image viewer"),
+            ("ASCII fallback", lambda: True, self._show_ascii,
+             "─" * 60 + "\n📝 Displayed using ASCII fallback"),
+        )
+    
+    def _init_capabilities(self) -> None:
+        """Load capabilities from the on-disk cache, probing again when it can't be trusted
+        
+        A missing tool is probed again every run, since the user may install it at any
+        time; the cache file is only rewritten when its contents change.
+        """
+        cached = self._load_cached_capabilities()
+        if cached and cached['supports_chafa'] and cached['supports_external']:
+            capabilities = cached
+        else:
+            capabilities = {
+                'key': self._capability_cache_key(),
+                'terminal_type': self._detect_terminal(),
+                'supports_chafa': self._check_chafa_support(),
+                'supports_external': self._check_external_viewer(),
+            }
+            if capabilities != cached:
+                self._save_cached_capabilities(capabilities)
+        
+        self.terminal_type = capabilities['terminal_type']
+        self.supports_chafa = capabilities['supports_chafa']
+        self.supports_external = capabilities['supports_external']
+    
+    def _capability_cache_key(self) -> str:
+        """Key the capability cache on everything the probes depend on
         
+        PATH directory mtimes change when an executable is added to or removed from them.
+        """
+        path_dirs = os.environ.get('PATH', '').split(os.pathsep)
+        mtimes = []
+        for path_dir in path_dirs:
+            try:
+                mtimes.append(str(os.stat(path_dir).st_mtime_ns))
+            except OSError:
+                mtimes.append('-')
+        probe_inputs = '|'.join([
+            os.environ.get('PATH', ''),
+            ','.join(mtimes),
+            sys.version,
+            os.environ.get('TERM', ''),
+            os.environ.get('TERM_PROGRAM', ''),
+        ])
+        return hashlib.blake2b(probe_inputs.encode(), digest_size=8).hexdigest()
+    
+    def _load_cached_capabilities(self) -> Optional[Dict[str, Any]]:
+        """Load capabilities from the on-disk cache if it matches the current environment"""
+        try:
+            with open(CAPABILITY_CACHE_FILE, 'r') as f:
+                data = json.load(f)
+            if data.get('key') != self._capability_cache_key():
+                return None
+            return {key: data[key] for key in ('key', 'terminal_type', 'supports_chafa', 'supports_external')}
+        except Exception:
+            # Missing or unreadable cache - probe again
+            return None
+    
+    def _save_cached_capabilities(self, capabilities: Dict[str, Any]) -> None:
+        """Persist probed capabilities (best effort - this is only a cache)"""
+        try:
+            CAPABILITY_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            with open(CAPABILITY_CACHE_FILE, 'w') as f:
+                json.dump(capabilities, f)
+        except Exception:
+            pass
+    
     def _detect_terminal(self) -> str:
         """Detect terminal type and capabilities"""
         term = os.environ.get('TERM', '')
@@ -37,7 +179,7 @@ class ImagePreview:
     def _check_chafa_support(self) -> bool:
         """Check if chafa is available (system command or Python library)"""
         # First try system chafa command
-        if shutil.which('chafa'):
+        if _which('chafa'):
             return True
         
         # Try Python chafa libraries
@@ -57,11 +199,11 @@ class ImagePreview:
     
     def _check_external_viewer(self) -> bool:
         """Check if external image viewer is available"""
-        if shutil.which('open'):  # macOS
+        if _which('open'):  # macOS
             return True
-        elif shutil.which('xdg-open'):  # Linux
+        elif _which('xdg-open'):  # Linux
             return True
-        elif shutil.which('start'):  # Windows
+        elif _which('start'):  # Windows
             return True
         return False
     
@@ -97,96 +239,75 @@ class ImagePreview:
         print(f"\n📸 Image Preview: {Path(image_path).name} ({width}×{height})")
         print("─" * min(width, 80))
         
-        # Method 1: Try Chafa for color terminal display
-        if self.supports_chafa:
-            try:
-                success = self._show_chafa(image_path, width, height)
-                if success:
-                    print("─" * 60)
-                    print("🎨 Displayed using Chafa (color terminal graphics)")
-                    return True
-            except Exception as e:
-                print(f"⚠️ Chafa failed: {e}")
-        
-        # Method 1.5: Try Rich console image (basic color support)
-        try:
-            success = self._show_rich_image(image_path, width, height)
-            if success:
-                print("─" * 60)
-                print("🌈 Displayed using Rich (colored terminal graphics)")
-                return True
-        except Exception as e:
-            print(f"⚠️ Rich display failed: {e}")
-        
-        # Method 2: External viewer as backup
-        if self.supports_external:
+        # Dispatch to the first available method that succeeds
+        for label, is_available, method, banner in self._methods:
+            if not is_available():
+                continue
             try:
-                success = self._show_external(image_path)
-                if success:
-                    print("🖼️ Opened in external image viewer")
+                if method(image_path, width, height):
+                    if banner:
+                        print(banner)
                     return True
             except Exception as e:
-                print(f"⚠️ External viewer failed: {e}")
+                print(f"⚠️ {label} failed: {e}")
         
-        # Method 3: ASCII fallback
-        try:
-            ascii_art = self._generate_ascii(image_path, width, height)
-            print(ascii_art)
-            print("─" * 60)
-            print("📝 Displayed using ASCII fallback")
-            return True
-        except Exception as e:
-            print(f"❌ All preview methods failed: {e}")
-            return False
+        print("❌ All preview methods failed")
+        return False
     
     def _show_chafa(self, image_path: str, width: int, height: Optional[int] = None) -> bool:
         """Display image using Chafa with color support"""
         # Calculate height if not provided
         if height is None:
-            with Image.open(image_path) as img:
-                aspect_ratio = img.height / img.width
-                height = int(width * aspect_ratio * 0.5)  # Terminal character aspect ratio
+            height = _preview_height(image_path, width)
         
         # Try system chafa command first with smart format detection
-        if shutil.which('chafa'):
-            # For Alacritty, skip to symbols format as it doesn't support graphics protocols
-            if self.terminal_type == 'alacritty':
-                formats_to_try = ['symbols']
-            else:
-                # Try formats in order of quality for other terminals
-                formats_to_try = ['sixels', 'iterm', 'kitty', 'symbols']
+        chafa_bin = _which('chafa')
+        if chafa_bin:
+            # Output goes straight to the terminal and can't be validated afterwards,
+            # so pick the format from the detected terminal up front
+            preferred_format = self._preferred_chafa_format()
+            formats_to_try = [preferred_format]
+            if preferred_format != 'symbols':
+                formats_to_try.append('symbols')
             
-            for fmt in formats_to_try:
-                try:
-                    cmd = [
-                        'chafa',
-                        '--size', f'{width}x{height}',
-                        '--colors=full',  # Use full color range
-                        f'--format={fmt}',  # Try each format
-                        '--color-space=din99d',  # Better color accuracy
-                        '--optimize=9',  # Maximum optimization for quality
-                        '--dither=diffusion',  # Better dithering
-                        image_path
-                    ]
-                    
-                    # Set timeout for formats that might not be supported
-                    result = subprocess.run(cmd, capture_output=True, text=True, 
-                                          check=True, timeout=3)
-                    
-                    # Validate output - check if it's raw graphics codes or actual display content
-                    output = result.stdout
-                    if output and not self._is_raw_graphics_codes(output):
-                        print(output)
+            source_path = _reduced_copy(image_path, width, height)
+            try:
+                for fmt in formats_to_try:
+                    try:
+                        cmd = [
+                            chafa_bin,
+                            '--size', f'{width}x{height}',
+                            '--colors=full',  # Use full color range
+                            f'--format={fmt}',  # Try each format
+                            '--color-space=din99d',  # Better color accuracy
+                            '--optimize=9',  # Maximum optimization for quality
+                            '--dither=diffusion',  # Better dithering
+                            source_path
+                        ]
+                        
+                        # Let chafa write directly to the inherited stdout instead of
+                        # buffering megabytes of escape sequences through Python
+                        sys.stdout.flush()
+                        subprocess.run(cmd, stdout=None, stderr=subprocess.DEVNULL,
+                                       check=True, timeout=3)
+                        
                         print("─" * 60)
                         print(f"🎨 Displayed using Chafa ({fmt} format - high quality)")
                         return True
-                    else:
-                        # Invalid output, try next format
-                        continue
                     
-                except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
-                    # Try next format
-                    continue
+                    except subprocess.CalledProcessError:
+                        # chafa rejects an unsupported format or unreadable image before
+                        # writing anything, so the next format can still be tried
+                        continue
+                    except subprocess.TimeoutExpired:
+                        # Part of the image may already be on the terminal - close off the
+                        # escape sequence instead of drawing another format after it
+                        sys.stdout.write(_ABORT_GRAPHICS)
+                        sys.stdout.flush()
+                        return False
+            finally:
+                if source_path != image_path:
+                    os.unlink(source_path)
             
             # If all formats failed, fall through to Python libraries
         
@@ -225,22 +346,17 @@ class ImagePreview:
             
         return False
     
-    def _is_raw_graphics_codes(self, output: str) -> bool:
-        """Check if output contains raw graphics protocol codes that won't display properly"""
-        # Check for common graphics protocol escape sequences
-        graphics_indicators = [
-            '_Ga=',  # Kitty graphics protocol
-            '\033_G',  # Kitty graphics escape
-            '\033P',  # Sixel start sequence
-            'q\033',  # Sixel end sequence
-        ]
-        
-        # If output starts with graphics codes, it's likely raw protocol data
-        for indicator in graphics_indicators:
-            if indicator in output[:100]:  # Check first 100 chars
-                return True
-        
-        return False
+    def _preferred_chafa_format(self) -> str:
+        """Pick the chafa output format supported by the detected terminal"""
+        if self.terminal_type == 'iterm2':
+            return 'iterm'
+        elif self.terminal_type == 'kitty':
+            return 'kitty'
+        term = f"{os.environ.get('TERM', '')} {os.environ.get('TERM_PROGRAM', '')}".lower()
+        if any(name in term for name in _SIXEL_TERMINALS):
+            return 'sixels'
+        # Alacritty and most other terminals don't support graphics protocols
+        return 'symbols'
     
     def _show_rich_image(self, image_path: str, width: int, height: Optional[int] = None) -> bool:
         """Display image using Rich with color blocks"""
@@ -250,87 +366,66 @@ class ImagePreview:
             
             console = Console()
             
-            # Calculate height if not provided
+            # Only the header is needed: the blocks are drawn in a single style,
+            # so per-pixel color lookups would never reach the output
             if height is None:
-                with Image.open(image_path) as img:
-                    aspect_ratio = img.height / img.width
-                    height = int(width * aspect_ratio * 0.5)
+                height = _preview_height(image_path, width)
+            else:
+                _image_size(image_path, os.stat(image_path).st_mtime_ns)  # Still reject non-images
             
-            # Open and resize image
-            with Image.open(image_path) as img:
-                # Convert to RGB if needed
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Resize image
-                img = img.resize((width, height))
-                
-                # Create Rich Text with colored blocks
-                text = Text()
-                
-                for y in range(height):
-                    line = ""
-                    for x in range(width):
-                        r, g, b = img.getpixel((x, y))
-                        # Use Unicode block characters with colors
-                        color = f"rgb({r},{g},{b})"
-                        line += "█"  # Full block character
-                    
-                    # Add line with colors (approximate - Rich has color limitations)
-                    text.append(line + "\n", style="bold")
-                
-                console.print(text)
-                return True
-                
+            # Create Rich Text with block rows
+            text = Text()
+            text.append(("█" * width + "\n") * height, style="bold")
+            
+            console.print(text)
+            return True
+        
         except Exception as e:
             return False
     
     def _show_external(self, image_path: str) -> bool:
         """Open image in external viewer"""
+        if _which('open'):  # macOS
+            command = ['open']
+        elif _which('xdg-open'):  # Linux
+            command = ['xdg-open']
+        elif sys.platform == 'win32':  # 'start' is a cmd builtin, not an executable
+            command = ['cmd', '/c', 'start', '']
+        else:
+            return False
+        
         try:
-            if shutil.which('open'):  # macOS
-                subprocess.run(['open', image_path], check=True, 
-                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            elif shutil.which('xdg-open'):  # Linux
-                subprocess.run(['xdg-open', image_path], check=True,
-                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            elif shutil.which('start'):  # Windows
-                subprocess.run(['start', image_path], shell=True, check=True,
-                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            else:
-                return False
+            # Launch the viewer without a shell and without waiting for it to exit
+            subprocess.Popen(command + [image_path], stdout=subprocess.DEVNULL,
+                             stderr=subprocess.DEVNULL, start_new_session=True)
             return True
-        except subprocess.CalledProcessError:
+        except OSError:
             return False
     
+    def _show_external_preview(self, image_path: str, width: int, height: Optional[int] = None) -> bool:
+        """Adapt _show_external to the preview method signature"""
+        return self._show_external(image_path)
+    
+    def _show_ascii(self, image_path: str, width: int, height: Optional[int] = None) -> bool:
+        """Print ASCII art fallback"""
+        print(self._generate_ascii(image_path, width, height))
+        return True
+    
     def _generate_ascii(self, image_path: str, width: int, height: Optional[int] = None) -> str:
         """Generate ASCII art as fallback"""
         try:
-            # ASCII characters from dark to light
-            chars = " .:-=+*#%@"
-            
             with Image.open(image_path) as img:
-                # Convert to grayscale and resize
-                img = img.convert('L')
-                
                 # Calculate height if not provided
                 if height is None:
                     aspect_ratio = img.height / img.width
                     height = int(width * aspect_ratio * 0.55)  # Character aspect ratio
                 
-                img = img.resize((width, height))
+                # Let JPEG decoding downscale while it decodes, then convert the small image
+                img.draft('L', (width * 2, height * 2))
+                img = img.convert('L').resize((width, height), Image.Resampling.BILINEAR)
                 
                 # Convert to ASCII
-                ascii_lines = []
-                for y in range(height):
-                    line = ""
-                    for x in range(width):
-                        pixel = img.getpixel((x, y))
-                        char_index = int(pixel * (len(chars) - 1) / 255)
-                        line += chars[char_index]
-                    ascii_lines.append(line)
-                
-                return '\n'.join(ascii_lines)
+                return grayscale_to_ascii(img)
                 
         except Exception as e:
             return f"[ASCII preview failed: {e}]"
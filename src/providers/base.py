@@ -1,10 +1,16 @@
 """Base classes for AI model providers"""
+import sys
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Any, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, FrozenSet, List, Optional, Any, Sequence, Union
 from dataclasses import dataclass
 from enum import Enum
 
 
+# Slotted dataclasses drop the per-instance __dict__ (dataclass slots needs Python 3.10+)
+_DATACLASS_SLOTS: Dict[str, Any] = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
 class ModelCapability(Enum):
     """Capabilities that a model provider can support"""
     TEXT_TO_IMAGE = "text_to_image"
@@ -14,7 +20,7 @@ class ModelCapability(Enum):
     EDITING = "editing"
 
 
-@dataclass
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class GenerationRequest:
     """Standard request format for image generation"""
     prompt: str
@@ -28,9 +34,10 @@ class GenerationRequest:
     reference_images: Optional[List[str]] = None
     fine_tuned_model: Optional[str] = None
     extra_params: Optional[Dict[str, Any]] = None
+    verbose: bool = False  # Stream provider job logs for this request
 
 
-@dataclass
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class GenerationResult:
     """Standard result format for image generation"""
     success: bool
@@ -41,13 +48,13 @@ class GenerationResult:
     seed: Optional[int] = None
 
 
-@dataclass
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class ModelInfo:
-    """Information about an available model"""
+    """Information about an available model (immutable, so providers can share instances)"""
     name: str
     display_name: str
     description: str
-    capabilities: List[ModelCapability]
+    capabilities: FrozenSet[ModelCapability]
     max_images: int = 1
     supports_fine_tuning: bool = False
     default_params: Optional[Dict[str, Any]] = None
@@ -68,7 +75,7 @@ class BaseProvider(ABC):
         pass
     
     @abstractmethod
-    def get_available_models(self) -> List[ModelInfo]:
+    def get_available_models(self) -> Sequence[ModelInfo]:
         """Get list of available models from this provider"""
         pass
     
@@ -86,8 +93,14 @@ class BaseProvider(ABC):
         models = self.get_available_models()
         return next((m for m in models if m.name == model_name), None)
     
-    def validate_request(self, request: GenerationRequest) -> List[str]:
-        """Validate a generation request and return any errors"""
+    def validate_request(self, request: GenerationRequest,
+                         model_info: Optional[ModelInfo] = None) -> List[str]:
+        """Validate a generation request and return any errors
+        
+        Args:
+            request: Request to validate
+            model_info: Already looked-up info for the request's model, to skip a second lookup
+        """
         errors = []
         
         if not request.prompt.strip():
@@ -96,7 +109,8 @@ class BaseProvider(ABC):
         if request.num_images < 1:
             errors.append("Number of images must be at least 1")
         
-        model_info = self.get_model_info(request.model_name)
+        if model_info is None:
+            model_info = self.get_model_info(request.model_name)
         if not model_info:
             errors.append(f"Model '{request.model_name}' not found")
         elif request.num_images > model_info.max_images:
@@ -148,10 +162,14 @@ class ProviderRegistry:
     
     def get_all_models(self) -> List[ModelInfo]:
         """Get all available models from all providers"""
-        models = []
-        for provider in self._providers.values():
-            models.extend(provider.get_available_models())
-        return models
+        providers = list(self._providers.values())
+        if len(providers) <= 1:
+            return [m for p in providers for m in p.get_available_models()]
+        
+        # Providers may fetch their model lists remotely, so overlap the calls
+        with ThreadPoolExecutor(max_workers=len(providers)) as executor:
+            results = list(executor.map(lambda p: p.get_available_models(), providers))
+        return [m for models in results for m in models]
     
     def get_models_with_capability(self, capability: ModelCapability) -> List[ModelInfo]:
         """Get all models that support a specific capability"""
@@ -169,8 +187,9 @@ class ProviderRegistry:
                 error_message=f"No provider found for model '{request.model_name}'"
             )
         
-        # Validate request
-        errors = provider.validate_request(request)
+        # Validate request, reusing the model lookup
+        model_info = provider.get_model_info(request.model_name)
+        errors = provider.validate_request(request, model_info=model_info)
         if errors:
             return GenerationResult(
                 success=False,
@@ -0,0 +1,187 @@
+"""Semantic prompt cache for skipping near-duplicate generations"""
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+# Sentence-transformers model used when the package is installed
+SENTENCE_MODEL = "all-MiniLM-L6-v2"
+
+# Cached results point at FAL URLs, which expire - entries are only reused for a day
+ENTRY_TTL = 24 * 60 * 60
+
+# Minimum seconds between index writes; pending entries are flushed at exit
+SAVE_INTERVAL = 5.0
+
+
+class SemanticCache:
+    """Cache of generation results keyed by prompt similarity
+    
+    When sentence-transformers is installed, a lookup returns the stored result of
+    the most similar prompt generated with the same parameters, provided the cosine
+    similarity clears the threshold. Without it, only prompts that are identical
+    after normalizing case, whitespace and punctuation match - cheap lexical
+    embeddings can't tell "red hat" from "blue hat". Entries expire after ttl
+    seconds because the cached image URLs do.
+    """
+    
+    def __init__(self, index_path: Optional[Path] = None, threshold: float = 0.92,
+                 max_entries: int = 512, ttl: float = ENTRY_TTL) -> None:
+        self.index_path = index_path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._model = None
+        self._model_loaded = False
+        self._entries: List[Dict[str, Any]] = []
+        self._loaded = False
+        self._dirty = False
+        self._last_save = 0.0
+        self._flush_registered = False
+    
+    @property
+    def embedder_name(self) -> str:
+        """Name of the embedder in use - embeddings from different embedders don't mix"""
+        return SENTENCE_MODEL if self._get_model() else "exact-prompt"
+    
+    def _get_model(self) -> Any:
+        """Load the sentence-transformers model on first use, if available"""
+        if not self._model_loaded:
+            self._model_loaded = True
+            try:
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(SENTENCE_MODEL)
+            except Exception:
+                self._model = None
+        return self._model
+    
+    def embed(self, text: str) -> Optional[List[float]]:
+        """Embed a prompt as a unit-length vector (None without sentence-transformers)"""
+        model = self._get_model()
+        if model is None:
+            return None
+        return [float(x) for x in model.encode(text, normalize_embeddings=True)]
+    
+    def lookup(self, prompt: str, params_key: str) -> Optional[Dict[str, Any]]:
+        """Find a cached result for a similar prompt generated with the same parameters
+        
+        Args:
+            prompt: Prompt to look up
+            params_key: Serialized generation parameters that must match exactly
+        
+        Returns:
+            Cached entry with 'prompt', 'images' and 'seed', or None on a miss
+        """
+        embedding = self.embed(prompt)
+        normalized = _normalize(prompt)
+        now = time.time()
+        with self._lock:
+            self._ensure_loaded()
+            best_entry, best_score = None, self.threshold
+            for entry in self._entries:
+                if entry['params_key'] != params_key or now - entry['created'] >= self.ttl:
+                    continue
+                if embedding is None:
+                    if entry['normalized'] == normalized:
+                        best_entry = entry
+                        break
+                    continue
+                score = _dot(embedding, entry['embedding'])
+                if score >= best_score:
+                    best_entry, best_score = entry, score
+            
+            if best_entry is not None:
+                best_entry['last_used'] = now
+            return best_entry
+    
+    def insert(self, prompt: str, params_key: str, images: List[Dict[str, str]],
+               seed: Optional[int] = None) -> None:
+        """Store a generation result for later lookups"""
+        embedding = self.embed(prompt)
+        now = time.time()
+        with self._lock:
+            self._ensure_loaded()
+            self._entries = [e for e in self._entries if now - e['created'] < self.ttl]
+            self._entries.append({
+                'prompt': prompt,
+                'normalized': _normalize(prompt),
+                'params_key': params_key,
+                'embedding': embedding,
+                'images': images,
+                'seed': seed,
+                'created': now,
+                'last_used': now,
+            })
+            
+            # Evict least recently used entries beyond capacity
+            if len(self._entries) > self.max_entries:
+                self._entries.sort(key=lambda e: e['last_used'])
+                del self._entries[:len(self._entries) - self.max_entries]
+            
+            self._dirty = True
+            due = time.monotonic() - self._last_save >= SAVE_INTERVAL
+            if self.index_path and not self._flush_registered:
+                self._flush_registered = True
+                atexit.register(self.flush)
+        
+        if due:
+            self.flush()
+    
+    def flush(self) -> None:
+        """Write pending entries to the index file (best effort - this is only a cache)
+        
+        The file is written to a temporary path and swapped in with os.replace, so
+        a crash mid-write never leaves a truncated index behind.
+        """
+        if not self.index_path:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                self._dirty = False
+                self._last_save = time.monotonic()
+                data = json.dumps({'embedder': self.embedder_name, 'entries': self._entries})
+            
+            tmp_path = self.index_path.with_suffix(self.index_path.suffix + '.tmp')
+            try:
+                with open(tmp_path, 'w') as f:
+                    f.write(data)
+                os.replace(tmp_path, self.index_path)
+            except OSError:
+                pass
+    
+    def _ensure_loaded(self) -> None:
+        """Load persisted entries once, discarding expired ones and those made by another embedder"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.index_path or not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, 'r') as f:
+                data = json.load(f)
+            if data.get('embedder') == self.embedder_name:
+                now = time.time()
+                self._entries = [e for e in data.get('entries', [])
+                                 if 'created' in e and now - e['created'] < self.ttl]
+        except (json.JSONDecodeError, IOError):
+            # Corrupted cache - start empty
+            self._entries = []
+
+
+def _normalize(text: str) -> str:
+    """Lowercase a prompt and collapse punctuation and whitespace"""
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+def _dot(a: List[float], b: List[float]) -> float:
+    """Dot product of two equal-length vectors (cosine similarity for unit vectors)"""
+    return sum(x * y for x, y in zip(a, b))
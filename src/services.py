@@ -1,100 +1,131 @@
 """Simple service locator for nano-banana application"""
 from typing import Optional, Dict, Any, TypeVar, Type, TYPE_CHECKING
 import os
+import threading
+
+from .providers.base import get_registry
+from .providers.fal_provider import FALProvider
+from .providers.semantic_cache import SemanticCache
 
 if TYPE_CHECKING:
     from .fal_wrapper import FALWrapper
 
-# Global service registry
-_services: Dict[str, Any] = {}
+# Global service registry, keyed by service type with a by-name index for mocked types
+_services: Dict[Any, Any] = {}
+_services_by_name: Dict[str, Any] = {}
 _initialized: bool = False
+_init_lock = threading.Lock()
 
 T = TypeVar('T')
 
 
-def register_service(service_type: Type[T], instance: T) -> None:
-    """Register a service instance"""
+def _service_name(service_type: Any) -> str:
+    """Get the name a service type is registered under"""
     # Handle both actual classes and mocked classes
     try:
-        service_name = service_type.__name__
+        return service_type.__name__
     except AttributeError:
         # For mocked classes, use the string representation
-        service_name = str(service_type).split("'")[1].split(".")[-1]
-    _services[service_name] = instance
+        return str(service_type).split("'")[1].split(".")[-1]
+
+
+def register_service(service_type: Type[T], instance: T) -> None:
+    """Register a service instance"""
+    service_name = _service_name(service_type)
+    
+    # A new registration under the same name replaces any other type (e.g. a mock) using it
+    for stale_type in [t for t in _services if t is not service_type and _service_name(t) == service_name]:
+        del _services[stale_type]
+    
+    try:
+        _services[service_type] = instance
+    except TypeError:
+        # Unhashable (mocked) type - only reachable by name
+        pass
+    _services_by_name[service_name] = instance
 
 
 def get_service(service_type: Type[T]) -> T:
     """Get a service instance"""
-    # Handle both actual classes and mocked classes
     try:
-        service_name = service_type.__name__
-    except AttributeError:
-        # For mocked classes, use the string representation
-        service_name = str(service_type).split("'")[1].split(".")[-1]
+        return _services[service_type]
+    except (KeyError, TypeError):
+        # Not registered under this type, or an unhashable (mocked) type
+        pass
     
-    if service_name not in _services:
+    # Fall back to the name, e.g. when a mocked class stands in for the real one
+    service_name = _service_name(service_type)
+    if service_name not in _services_by_name:
         raise ValueError(f"Service {service_name} not registered. Call initialize_services() first.")
-    return _services[service_name]
+    return _services_by_name[service_name]
 
 
 def clear_services() -> None:
     """Clear all services (useful for testing)"""
     global _initialized
     _services.clear()
+    _services_by_name.clear()
     _initialized = False
 
 
+# Service modules are imported whole, and only once get_service exists: storage and
+# database import it back from here, so either side of the cycle may load first
+from . import config as _config, database as _database, fal_wrapper as _fal_wrapper  # noqa: E402
+from . import image_preview as _image_preview, storage as _storage  # noqa: E402
+
+
 def initialize_services(verbose: bool = False) -> None:
-    """Initialize all core services"""
+    """Initialize all core services (safe to call from multiple threads)"""
     global _initialized
     
     if _initialized:
         return
     
-    from .config import Config
-    from .storage import StorageManager
-    from .database import DatabaseManager
-    from .fal_wrapper import FALWrapper
-    from .image_preview import ImagePreview
-    from .providers.base import get_registry
-    from .providers.fal_provider import FALProvider
-    
-    # Initialize in dependency order
-    config = Config()
-    register_service(Config, config)  # Register config first so other services can use it
-    
-    storage = StorageManager()
-    database = DatabaseManager()
-    image_preview = ImagePreview()
-    
-    # FAL wrapper with optional API key
-    fal_client = None
-    try:
-        fal_client = FALWrapper(verbose=verbose, db_manager=database)
-    except ValueError:
-        # No FAL key available - will be handled by commands that need it
-        pass
-    
-    # Initialize provider registry
-    registry = get_registry()
-    fal_api_key = getattr(config, 'fal_key', None)
-    if fal_api_key and isinstance(fal_api_key, str):
+    with _init_lock:
+        # Another thread may have finished initializing while we waited
+        if _initialized:
+            return
+        
+        # Initialize in dependency order
+        config = _config.Config()
+        register_service(_config.Config, config)  # Register config first so other services can use it
+        
+        storage = _storage.StorageManager()
+        database = _database.DatabaseManager()
+        image_preview = _image_preview.ImagePreview()
+        
+        # FAL wrapper with optional API key
+        fal_client = None
         try:
-            fal_provider = FALProvider(api_key=fal_api_key)
-            registry.register_provider(fal_provider)
-        except Exception:
-            # Provider initialization failed - skip registration
+            fal_client = _fal_wrapper.FALWrapper(verbose=verbose, db_manager=database)
+        except ValueError:
+            # No FAL key available - will be handled by commands that need it
             pass
-    
-    # Register remaining services (Config already registered)
-    register_service(StorageManager, storage)
-    register_service(DatabaseManager, database)
-    register_service(ImagePreview, image_preview)
-    
-    if fal_client:
-        register_service(FALWrapper, fal_client)
-    
-    _initialized = True
+        
+        # Initialize provider registry
+        registry = get_registry()
+        fal_api_key = getattr(config, 'fal_key', None)
+        if fal_api_key and isinstance(fal_api_key, str):
+            try:
+                semantic_cache = None
+                if getattr(config, 'enable_semantic_cache', False) is True:
+                    semantic_cache = SemanticCache(index_path=config.storage_dir / 'semantic_cache.json')
+                fal_provider = FALProvider(api_key=fal_api_key, db_manager=database,
+                                           semantic_cache=semantic_cache)
+                registry.register_provider(fal_provider)
+            except Exception:
+                # Provider initialization failed - skip registration
+                pass
+        
+        # Register remaining services (Config already registered)
+        register_service(_storage.StorageManager, storage)
+        register_service(_database.DatabaseManager, database)
+        register_service(_image_preview.ImagePreview, image_preview)
+        
+        if fal_client:
+            register_service(_fal_wrapper.FALWrapper, fal_client)
+        
+        _initialized = True
 
 
 def is_initialized() -> bool:
@@ -105,8 +136,7 @@ def is_initialized() -> bool:
 def get_fal_client() -> Optional['FALWrapper']:
     """Get FAL client if available"""
     try:
-        from .fal_wrapper import FALWrapper
-        return get_service(FALWrapper)
+        return get_service(_fal_wrapper.FALWrapper)
     except ValueError:
         return None
 
@@ -1,26 +1,41 @@
 """Session-based TUI Editor for iterative image editing"""
 import os
 import time
+from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set, Tuple
 
 from textual.app import App, ComposeResult
 from textual.containers import Horizontal, Vertical, ScrollableContainer
-from textual.widgets import Input, Static, Footer, Header, ListView, ListItem, Label, Button
+from textual.widgets import Input, Static, Footer, Header, ListView, ListItem, Label, Button, OptionList
+from textual.widgets.option_list import Option
+from rich.text import Text
 from textual.binding import Binding
 from textual.reactive import reactive
-from textual import on, events
+from textual import on, events, work
+from textual.timer import Timer
+import fal_client as fal
 
 from .database import DatabaseManager
 from .ui_components import (
+    SELECTION_DEBOUNCE,
     ImagePreviewWidget, 
-    SessionStepItem, 
+    step_label, 
     format_step_info,
     open_image_externally,
+    install_uvloop,
     COMMON_TUI_CSS
 )
 
 
+class SessionListItem(ListItem):
+    """List item for a session in the session selector"""
+    
+    def __init__(self, session: Dict[str, Any], info_text: str) -> None:
+        self.session_data = session
+        super().__init__(Label(info_text))
+        self.add_class("session-item")
+
 
 class SessionSelectorApp(App):
     """TUI for selecting which session to edit"""
@@ -55,9 +70,13 @@ class SessionSelectorApp(App):
         Binding("enter", "select_session", "Select Session"),
     ]
     
-    def __init__(self):
+    # Formatted row text per session id, with the fields it was built from; shared by
+    # every selector run, since switching sessions starts a new selector app
+    _row_cache: Dict[int, Tuple[Tuple[Any, ...], str]] = {}
+    
+    def __init__(self, db: DatabaseManager):
         super().__init__()
-        self.db = DatabaseManager()
+        self.db = db
         self.sessions = []
         self.selected_session = None
     
@@ -97,19 +116,27 @@ class SessionSelectorApp(App):
             return
         
         for session in self.sessions:
-            # Format session info
-            name = session['name']
-            step_count = session['step_count'] or 0
-            created = session['created_timestamp'][:19].replace('T', ' ')
-            
-            info_text = f"[bold]{name}[/bold]\n{step_count} steps • Created: {created}"
-            if session.get('description'):
-                info_text += f"\n[dim]{session['description']}[/dim]"
-            
-            item = ListItem(Label(info_text))
-            item.add_class("session-item")
-            item.session_data = session
-            session_list.append(item)
+            session_list.append(SessionListItem(session, self._format_session_row(session)))
+    
+    def _format_session_row(self, session: Dict[str, Any]) -> str:
+        """Format a session's list text, reusing the cached text if the session is unchanged"""
+        signature = (session['name'], session['step_count'], session['created_timestamp'],
+                     session.get('description'))
+        cached = self._row_cache.get(session['id'])
+        if cached and cached[0] == signature:
+            return cached[1]
+        
+        # Format session info
+        name = session['name']
+        step_count = session['step_count'] or 0
+        created = session['created_timestamp'][:19].replace('T', ' ')
+        
+        info_text = f"[bold]{name}[/bold]\n{step_count} steps • Created: {created}"
+        if session.get('description'):
+            info_text += f"\n[dim]{session['description']}[/dim]"
+        
+        self._row_cache[session['id']] = (signature, info_text)
+        return info_text
     
     @on(Button.Pressed, "#new-session-btn")
     def on_new_session(self):
@@ -201,15 +228,26 @@ class SessionEditorApp(App):
         Binding("e", "focus_edit", "Edit"),
     ]
     
-    def __init__(self, session_id: int, fal_wrapper, storage_manager):
+    def __init__(self, session_id: int, fal_wrapper, storage_manager, db: DatabaseManager):
         super().__init__()
         self.session_id = session_id
         self.fal = fal_wrapper
         self.storage = storage_manager
-        self.db = DatabaseManager()
+        self.db = db
         self.session = None
         self.steps = []
         self.selected_step = None
+        # Ids of steps shown in the step list (None until the list is first built)
+        self._rendered_step_ids: Optional[Set[int]] = None
+        # Step shown at each step list row, the initial image first
+        self._step_rows: List[Dict[str, Any]] = []
+        self._editing = False
+        # Formatted info panel text by step id (0 for the initial image), and the id currently shown
+        self._info_cache: Dict[int, str] = {}
+        self._shown_info_id: Optional[int] = None
+        # Step highlighted while scrolling, shown once the highlight settles
+        self._pending_step: Optional[Dict[str, Any]] = None
+        self._select_timer: Optional[Timer] = None
     
     def compose(self) -> ComposeResult:
         with Horizontal():
@@ -217,7 +255,8 @@ class SessionEditorApp(App):
             with Vertical(id="left-panel"):
                 yield Header()
                 yield Input(placeholder="Enter edit prompt...", id="edit-input")
-                yield ListView(id="step-list")
+                # OptionList only renders the rows in view, so long sessions stay cheap
+                yield OptionList(id="step-list")
             
             # Right panel: Image preview and step info
             with Vertical(id="right-panel"):
@@ -239,44 +278,88 @@ class SessionEditorApp(App):
     
     def load_session_data(self):
         """Load session and steps from database"""
-        self.session = self.db.get_session_by_id(self.session_id)
-        self.steps = self.db.get_session_steps(self.session_id)
+        self._data_version = self.db.data_version()
+        self.session, self.steps = self.db.get_session_with_steps(self.session_id)
+        for step in self.steps:
+            self._annotate_step(step)
         
         if self.session:
             self.title = f"Session Editor - {self.session['name']}"
             self.sub_title = f"{len(self.steps)} edit steps"
     
+    @staticmethod
+    def _annotate_step(step: Dict[str, Any]) -> Dict[str, Any]:
+        """Precompute a step's file name and whether its image exists, once per load"""
+        image_path = step.get('image_path') or ''
+        step['_filename'] = os.path.basename(image_path)
+        step['_exists'] = bool(image_path) and os.path.exists(image_path)
+        return step
+    
     def refresh_step_list(self):
-        """Refresh the step list display"""
-        step_list = self.query_one("#step-list", ListView)
-        step_list.clear()
+        """Bring the step list up to date, appending only steps not shown yet"""
+        if self._rendered_step_ids is None:
+            self._full_rebuild()
+            return
+        
+        self._append_steps([step for step in self.steps if step['id'] not in self._rendered_step_ids])
+    
+    def _full_rebuild(self):
+        """Rebuild the whole step list display"""
+        step_list = self.query_one("#step-list", OptionList)
+        step_list.clear_options()
+        self._rendered_step_ids = None
+        self._step_rows = []
         
         if not self.session:
-            step_list.append(ListItem(Label("[red]Session not found[/red]")))
+            step_list.add_option(Option(Text.from_markup("[red]Session not found[/red]"), disabled=True))
             return
         
         # Add initial image as step 0
-        initial_step = {
+        initial_step = self._annotate_step({
             'step_number': 0,
             'prompt': 'Initial Image',
             'image_path': self.session['initial_image_path'],
             'success': True
-        }
-        step_item = SessionStepItem(initial_step, is_initial=True)
-        step_item.step_data = initial_step
-        step_list.append(step_item)
+        })
+        step_list.add_option(Option(Text(step_label(initial_step, is_initial=True))))
+        self._step_rows.append(initial_step)
         
         # Add all edit steps
-        for step in self.steps:
-            step_item = SessionStepItem(step)
-            step_item.step_data = step
-            step_list.append(step_item)
-    
-    @on(ListView.Selected)
-    def on_step_selected(self, event: ListView.Selected):
+        self._rendered_step_ids = set()
+        self._append_steps(self.steps)
+    
+    def _append_steps(self, steps: List[Dict[str, Any]]):
+        """Append edit steps to the step list in one batch"""
+        if steps:
+            self.query_one("#step-list", OptionList).add_options([Option(Text(step_label(step))) for step in steps])
+        self._step_rows.extend(steps)
+        self._rendered_step_ids.update(step['id'] for step in steps)
+    
+    @on(OptionList.OptionSelected, "#step-list")
+    def on_step_selected(self, event: OptionList.OptionSelected):
         """Handle step selection"""
-        if hasattr(event.item, 'step_data'):
-            self.select_step(event.item.step_data)
+        self._cancel_pending_selection()
+        self.select_step(self._step_rows[event.option_index])
+    
+    @on(OptionList.OptionHighlighted, "#step-list")
+    def on_step_highlighted(self, event: OptionList.OptionHighlighted):
+        """Preview the highlighted step once scrolling pauses, so held arrow keys render only the last row"""
+        self._pending_step = self._step_rows[event.option_index]
+        if self._select_timer is not None:
+            self._select_timer.stop()
+        self._select_timer = self.set_timer(SELECTION_DEBOUNCE, self._flush_selection)
+    
+    def _flush_selection(self):
+        """Select the step highlighted when the debounce timer fired"""
+        step, self._pending_step, self._select_timer = self._pending_step, None, None
+        if step is not None:
+            self.select_step(step)
+    
+    def _cancel_pending_selection(self):
+        """Drop a debounced highlight superseded by an explicit selection"""
+        if self._select_timer is not None:
+            self._select_timer.stop()
+        self._pending_step = self._select_timer = None
     
     def select_step(self, step: Dict[str, Any]):
         """Select and display a step"""
@@ -284,16 +367,23 @@ class SessionEditorApp(App):
         
         # Update image preview
         image_preview = self.query_one("#image-preview", ImagePreviewWidget)
-        image_preview.update_image(step['image_path'])
+        image_preview.update_image(step['image_path'] if step.get('_exists', True) else None)
         
         # Update step info
         self.update_step_info(step)
     
     def update_step_info(self, step: Dict[str, Any]):
         """Update the step details panel"""
-        info_text = format_step_info(step)
+        step_id = step.get('id', 0)
+        if step_id == self._shown_info_id:
+            return
+        
+        info_text = self._info_cache.get(step_id)
+        if info_text is None:
+            info_text = self._info_cache[step_id] = format_step_info(step)
         step_info = self.query_one("#step-info")
         step_info.update(info_text)
+        self._shown_info_id = step_id
     
     @on(Input.Submitted, "#edit-input")
     def on_edit_submitted(self, event: Input.Submitted):
@@ -314,21 +404,27 @@ class SessionEditorApp(App):
             self.notify("No step selected")
             return
         
-        next_step_number = len(self.steps) + 1
+        if self._editing:
+            self.notify("An edit is already in progress")
+            return
+        
+        # Show progress
+        self._editing = True
+        self.notify(f"Applying edit: {prompt[:30]}...")
+        self._run_edit(prompt, self.selected_step['image_path'], len(self.steps) + 1)
+    
+    @work(thread=True, group="edit")
+    def _run_edit(self, prompt: str, current_image_path: str, next_step_number: int):
+        """Upload, edit and download in a worker thread so the UI stays responsive"""
         start_time = time.time()
         
         try:
-            # Show progress
-            self.notify(f"Applying edit: {prompt[:30]}...")
-            
-            # Get the image path for the current step
-            current_image_path = self.selected_step['image_path']
-            
             # Upload current image to FAL
-            import fal_client as fal
+            self.call_from_thread(self.notify, "Uploading image...")
             current_image_url = fal.upload_file(current_image_path)
             
             # Call edit endpoint
+            self.call_from_thread(self.notify, "Generating edit...")
             result = self.fal.edit_image(
                 prompt=prompt,
                 image_urls=[current_image_url]
@@ -341,21 +437,15 @@ class SessionEditorApp(App):
                 # Generate filename for edited image
                 timestamp = time.strftime("%Y%m%d_%H%M%S")
                 filename = f"session_{self.session_id}_step_{next_step_number}_{timestamp}.jpg"
-                new_image_path = str(self.storage.outputs_dir / filename)
                 
                 # Download image
-                import requests
-                response = requests.get(image_url)
-                response.raise_for_status()
-                
-                with open(new_image_path, 'wb') as f:
-                    f.write(response.content)
+                self.call_from_thread(self.notify, "Downloading result...")
+                new_image_path = self.storage.save_generated_image(image_url, filename)
                 
                 generation_time = time.time() - start_time
                 
                 # Add successful step to database
-                self.db.add_session_step(
-                    self.session_id,
+                step = self._record_step(
                     next_step_number,
                     prompt,
                     new_image_path,
@@ -363,15 +453,7 @@ class SessionEditorApp(App):
                     generation_time=generation_time
                 )
                 
-                # Refresh the session
-                self.load_session_data()
-                self.refresh_step_list()
-                
-                # Select the new step
-                if self.steps:
-                    self.select_step(self.steps[-1])
-                
-                self.notify(f"Edit applied successfully! ({generation_time:.1f}s)")
+                self.call_from_thread(self._finish_edit, f"Edit applied successfully! ({generation_time:.1f}s)", step)
             else:
                 raise Exception("No edited image returned from API")
             
@@ -379,8 +461,7 @@ class SessionEditorApp(App):
             generation_time = time.time() - start_time
             
             # Add failed step to database
-            self.db.add_session_step(
-                self.session_id,
+            step = self._record_step(
                 next_step_number,
                 prompt,
                 "",  # No image path for failed step
@@ -389,14 +470,58 @@ class SessionEditorApp(App):
                 generation_time=generation_time
             )
             
-            self.load_session_data()
-            self.refresh_step_list()
-            self.notify(f"Edit failed: {e}")
+            self.call_from_thread(self._finish_edit, f"Edit failed: {e}", step)
+    
+    def _record_step(self, step_number: int, prompt: str, image_path: str, success: bool,
+                     error_message: Optional[str] = None,
+                     generation_time: Optional[float] = None) -> Dict[str, Any]:
+        """Add a step to the database and return it shaped like a loaded step"""
+        step = {
+            'session_id': self.session_id,
+            'step_number': step_number,
+            'prompt': prompt,
+            'image_path': image_path,
+            'timestamp': datetime.now().isoformat(),
+            'success': success,
+            'error_message': error_message,
+            'generation_time': generation_time,
+        }
+        step['id'] = self.db.add_session_step(
+            self.session_id,
+            step_number,
+            prompt,
+            image_path,
+            success=success,
+            error_message=error_message,
+            generation_time=generation_time
+        )
+        return self._annotate_step(step)
+    
+    def _finish_edit(self, message: str, step: Dict[str, Any]):
+        """Show the outcome of an edit (runs on the UI thread)"""
+        self._editing = False
+        
+        # Append the new step in memory instead of reloading the session, which now matches the database
+        self.steps.append(step)
+        self._data_version = self.db.data_version()
+        self.sub_title = f"{len(self.steps)} edit steps"
+        self.refresh_step_list()
+        
+        # Select the new step (the initial image is item 0)
+        if step['success']:
+            self.query_one("#step-list", OptionList).highlighted = len(self.steps)
+            self.select_step(step)
+        
+        self.notify(message)
     
     def action_refresh(self):
-        """Reload session data"""
+        """Reload session data, unless nothing was written since the last load"""
+        if self.db.data_version() == self._data_version:
+            return
+        self._info_cache.clear()
+        self._shown_info_id = None
         self.load_session_data()
-        self.refresh_step_list()
+        self._full_rebuild()
     
     def action_switch_session(self):
         """Switch to a different session"""
@@ -416,18 +541,23 @@ class SessionEditorApp(App):
         self.exit(result=None)
 
 
-def run_session_editor(fal_wrapper, storage_manager):
+def run_session_editor(fal_wrapper, storage_manager, db: Optional[DatabaseManager] = None):
     """Run the session-based editor"""
+    install_uvloop()
+    
+    # One database manager serves every selector and editor run
+    db = db or DatabaseManager()
+    
     while True:
         # First, show session selector
-        selector = SessionSelectorApp()
+        selector = SessionSelectorApp(db)
         session_id = selector.run()
         
         if session_id is None:
             break  # User quit
         
         # Launch session editor
-        editor = SessionEditorApp(session_id, fal_wrapper, storage_manager)
+        editor = SessionEditorApp(session_id, fal_wrapper, storage_manager, db)
         result = editor.run()
         
         if result != "switch":
@@ -435,15 +565,16 @@ def run_session_editor(fal_wrapper, storage_manager):
         # If result == "switch", loop back to session selector
 
 
-def run_session_editor_with_image(fal_wrapper, storage_manager, image_path: str):
+def run_session_editor_with_image(fal_wrapper, storage_manager, image_path: str,
+                                  db: Optional[DatabaseManager] = None):
     """Run session editor directly with a specific image (creates new session)"""
-    from .database import DatabaseManager
+    install_uvloop()
     
     # Create new session with the provided image
-    db = DatabaseManager()
+    db = db or DatabaseManager()
     session_name = f"Session {len(db.get_sessions()) + 1}"
     session_id = db.create_session(session_name, image_path, f"Started with {Path(image_path).name}")
     
     # Launch session editor directly
-    editor = SessionEditorApp(session_id, fal_wrapper, storage_manager)
+    editor = SessionEditorApp(session_id, fal_wrapper, storage_manager, db)
     editor.run()
\ No newline at end of file
@@ -1,23 +1,30 @@
 """Split-screen TUI Editor with prompts on left and image preview on right"""
 import os
 import time
+from array import array
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 
 from textual.app import App, ComposeResult
 from textual.containers import Horizontal, Vertical, ScrollableContainer
-from textual.widgets import Input, Static, Footer, Header, ListView, ListItem, Label
+from textual.widgets import Input, Static, Footer, Header, OptionList
+from textual.widgets.option_list import Option
 from textual.binding import Binding
-from textual.reactive import reactive
-from textual import on, events
+from textual.reactive import reactive, var
+from textual import on, events, work
+from textual.timer import Timer
+from textual.worker import get_current_worker
 from textual.message import Message
+from rich.text import Text
 
 from .database import DatabaseManager
 from .ui_components import (
+    SELECTION_DEBOUNCE,
     ImagePreviewWidget,
-    GenerationListItem,
+    generation_label,
     format_generation_info,
     open_image_externally,
+    install_uvloop,
     COMMON_TUI_CSS
 )
 
@@ -67,14 +74,22 @@ class SplitEditorApp(App):
         ("ctrl+c", "quit", "Quit"),
     ]
     
-    generations = reactive(list)
-    filtered_generations = reactive(list)
+    # Nothing renders straight from these, so assigning them needn't repaint; always_update
+    # skips comparing a freshly loaded list against the old one item by item
+    generations = var(list, always_update=True)
+    filtered_generations = var(lambda: array('i'), always_update=True)  # Indexes into generations
     selected_generation = reactive(None)
     
-    def __init__(self):
+    def __init__(self, db: Optional[DatabaseManager] = None):
         super().__init__()
-        self.db = DatabaseManager()
-        self.load_generations()
+        self.db = db or DatabaseManager()
+        # Formatted info panel text by generation id, and the id currently shown
+        self._info_cache: Dict[int, str] = {}
+        self._shown_info_id: Optional[int] = None
+        # Generation highlighted while scrolling, shown once the highlight settles
+        self._pending_generation: Optional[Dict[str, Any]] = None
+        self._select_timer: Optional[Timer] = None
+        self._data_version: Optional[Tuple[int, ...]] = None
     
     def compose(self) -> ComposeResult:
         """Build the split-screen layout"""
@@ -82,7 +97,8 @@ class SplitEditorApp(App):
             # Left panel: Prompt list
             with Vertical(id="left-panel"):
                 yield Header()
-                yield ListView(id="prompt-list")
+                # OptionList only renders the rows in view, so long histories stay cheap
+                yield OptionList(id="prompt-list")
             
             # Right panel: Image preview and details
             with Vertical(id="right-panel"):
@@ -96,48 +112,83 @@ class SplitEditorApp(App):
     def on_mount(self):
         """Initialize the app after mounting"""
         self.title = "Nano Banana - Split Editor"
-        self.sub_title = f"{len(self.generations)} generations"
-        self.load_all_generations()
-        
-        # Select the first successful generation if available
-        if self.filtered_generations:
-            for gen in self.filtered_generations:
-                if gen['success'] and gen['image_paths']:
-                    self.select_generation(gen)
-                    break
+        self.sub_title = "Loading generations..."
+        self.load_generations()
     
     def load_generations(self):
-        """Load generations from database"""
+        """Load generations from database in a worker thread, then show them"""
+        self._load_worker()
+    
+    @work(thread=True, exclusive=True, group="load")
+    def _load_worker(self):
+        """Query generations off the event loop; a newer load cancels an older one"""
+        data_version = self.db.data_version()
         try:
-            self.generations = self.db.search_generations(limit=1000, success_only=False)
-            self.filtered_generations = self.generations.copy()
+            # List rows only show the start of each prompt; the info panel fetches the full record
+            generations = self.db.search_generations(limit=1000, success_only=False, preview=True)
         except Exception as e:
-            self.generations = []
-            self.filtered_generations = []
+            generations = []
+        if not get_current_worker().is_cancelled:
+            self.call_from_thread(self._apply_generations, data_version, generations)
+    
+    def _apply_generations(self, data_version: Tuple[int, ...], generations: List[Dict[str, Any]]):
+        """Show freshly loaded generations (runs on the UI thread)"""
+        with self.batch_update():
+            self._data_version = data_version
+            self.generations = generations
+            self.load_all_generations()
+            
+            # Select the first successful generation if nothing is selected yet
+            if self.selected_generation is None:
+                for index in self.filtered_generations:
+                    gen = self.generations[index]
+                    if gen['success'] and gen['image_paths']:
+                        self.select_generation(gen)
+                        break
     
     def load_all_generations(self):
         """Load all generations without filtering"""
-        self.filtered_generations = self.generations.copy()
+        self.filtered_generations = array('i', range(len(self.generations)))
         self.refresh_prompt_list()
         self.update_subtitle()
     
     def refresh_prompt_list(self):
         """Refresh the prompt list display"""
-        prompt_list = self.query_one("#prompt-list", ListView)
-        prompt_list.clear()
-        
-        for gen in self.filtered_generations:
-            prompt_list.append(GenerationListItem(gen))
+        prompt_list = self.query_one("#prompt-list", OptionList)
+        with self.batch_update():
+            prompt_list.clear_options()
+            prompt_list.add_options([Option(Text(generation_label(self.generations[index])))
+                                     for index in self.filtered_generations])
     
     def update_subtitle(self):
         """Update the subtitle with current counts"""
         self.sub_title = f"{len(self.generations)} generations"
     
-    @on(ListView.Selected)
-    def on_item_selected(self, event: ListView.Selected):
+    @on(OptionList.OptionSelected, "#prompt-list")
+    def on_item_selected(self, event: OptionList.OptionSelected):
         """Handle selection of a prompt item"""
-        if event.item and hasattr(event.item, 'generation'):
-            self.select_generation(event.item.generation)
+        self._cancel_pending_selection()
+        self.select_generation(self.generations[self.filtered_generations[event.option_index]])
+    
+    @on(OptionList.OptionHighlighted, "#prompt-list")
+    def on_item_highlighted(self, event: OptionList.OptionHighlighted):
+        """Preview the highlighted prompt once scrolling pauses, so held arrow keys render only the last row"""
+        self._pending_generation = self.generations[self.filtered_generations[event.option_index]]
+        if self._select_timer is not None:
+            self._select_timer.stop()
+        self._select_timer = self.set_timer(SELECTION_DEBOUNCE, self._flush_selection)
+    
+    def _flush_selection(self):
+        """Select the generation highlighted when the debounce timer fired"""
+        generation, self._pending_generation, self._select_timer = self._pending_generation, None, None
+        if generation is not None:
+            self.select_generation(generation)
+    
+    def _cancel_pending_selection(self):
+        """Drop a debounced highlight superseded by an explicit selection"""
+        if self._select_timer is not None:
+            self._select_timer.stop()
+        self._pending_generation = self._select_timer = None
     
     def select_generation(self, generation: Dict[str, Any]):
         """Select and display a generation"""
@@ -155,14 +206,50 @@ class SplitEditorApp(App):
     
     def update_generation_info(self, generation: Dict[str, Any]):
         """Update the generation details panel"""
-        info_text = format_generation_info(generation)
-        info_panel = self.query_one("#generation-info")
-        info_panel.update(info_text)
+        generation_id = generation['id']
+        if generation_id == self._shown_info_id:
+            return
+        
+        info_text = self._info_cache.get(generation_id)
+        if info_text is not None:
+            self._show_generation_info(generation_id, info_text)
+            return
+        
+        # Show the list row's details right away; the full record is fetched off the UI thread
+        self.query_one("#generation-info").update(format_generation_info(generation))
+        self._shown_info_id = None
+        self._info_worker(generation)
+    
+    @work(thread=True, exclusive=True, group="info")
+    def _info_worker(self, generation: Dict[str, Any]):
+        """Fetch and format a generation's full record; a newer selection cancels an older one"""
+        try:
+            full_generation = self.db.get_generation_by_id(generation['id']) or generation
+        except Exception:
+            full_generation = generation
+        info_text = format_generation_info(full_generation)
+        if not get_current_worker().is_cancelled:
+            self.call_from_thread(self._apply_generation_info, generation['id'], info_text)
+    
+    def _apply_generation_info(self, generation_id: int, info_text: str):
+        """Cache fetched details and show them if the generation is still selected (runs on the UI thread)"""
+        self._info_cache[generation_id] = info_text
+        if self.selected_generation is not None and self.selected_generation['id'] == generation_id:
+            self._show_generation_info(generation_id, info_text)
+    
+    def _show_generation_info(self, generation_id: int, info_text: str):
+        """Put a generation's details in the info panel"""
+        self.query_one("#generation-info").update(info_text)
+        self._shown_info_id = generation_id
     
     def action_refresh(self):
-        """Reload data from database"""
+        """Reload data from database, unless nothing was written since the last load"""
+        if self.db.data_version() == self._data_version:
+            return
+        self.workers.cancel_group(self, "info")
+        self._info_cache.clear()
+        self._shown_info_id = None
         self.load_generations()
-        self.load_all_generations()
     
     def action_open_image(self):
         """Open the selected image in external viewer"""
@@ -176,7 +263,8 @@ class SplitEditorApp(App):
         self.exit()
 
 
-def run_split_editor():
+def run_split_editor(db: Optional[DatabaseManager] = None):
     """Run the split-screen editor TUI"""
-    app = SplitEditorApp()
+    install_uvloop()
+    app = SplitEditorApp(db)
     app.run()
\ No newline at end of file
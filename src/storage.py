@@ -1,26 +1,124 @@
 """Local storage management for models and generated images"""
 import json
+import mmap
+import os
 import shutil
 import tempfile
+import time
+import types
 import requests
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
 from pathlib import Path
-from typing import Dict, Optional, Any
+from typing import Dict, List, Mapping, Optional, Any, Set, Tuple
 from .config import Config
 from .services import get_service
 
+try:
+    import orjson  # Optional: faster models registry load/save
+except ImportError:
+    orjson = None
+
+# Shared HTTP session so repeated image downloads reuse kept-alive connections
+_HTTP = requests.Session()
+
+# Copy buffer for image downloads - generated images are typically several MB
+_DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# (connect, read) timeouts in seconds for image downloads, so a stalled server can't hang a save
+_DOWNLOAD_TIMEOUT = (10, 30)
+
+# Shared pool for image downloads - they're network bound, so threads overlap the transfers
+_DOWNLOAD_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="image-download")
+
+
+# Registries at least this large are parsed straight from a memory map instead of a read() copy
+_REGISTRY_MMAP_THRESHOLD = 64 * 1024
+
+# Parsed models registries by file path, with the (mtime_ns, size) they were read at
+_REGISTRY_CACHE: Dict[str, Tuple[Tuple[int, int], Dict[str, Dict[str, Any]]]] = {}
+
+# Cached listing of one directory: (its mtime_ns, total size of its files, its subdirectories)
+_DirListing = Tuple[int, int, List[str]]
+
+
+def _dir_size(directory: Path, skip: Set[str] = frozenset(),
+              cache: Optional[Dict[str, _DirListing]] = None) -> int:
+    """Total size in bytes of the files under a directory
+    
+    Walks with os.scandir, whose entries carry their file type (and on Windows
+    their size) from the directory listing, and never follows symlinks.
+    
+    Args:
+        directory: Directory to measure (0 if missing)
+        skip: Paths of subdirectories to leave out
+        cache: Listings from earlier walks. A directory whose mtime is unchanged
+            reuses its listing for the cost of one stat; note that rewriting a file
+            in place doesn't change its directory's mtime.
+    """
+    total = 0
+    stack = [str(directory)]
+    while stack:
+        path = stack.pop()
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+            listing = cache.get(path) if cache is not None else None
+            if listing is None or listing[0] != mtime_ns:
+                files_size, subdirs = 0, []
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            files_size += entry.stat(follow_symlinks=False).st_size
+                listing = (mtime_ns, files_size, subdirs)
+                if cache is not None:
+                    cache[path] = listing
+        except OSError:
+            # Missing or unreadable directory
+            continue
+        total += listing[1]
+        stack.extend(subdir for subdir in listing[2] if subdir not in skip)
+    return total
+
 
 class StorageManager:
     """Manages local storage for models, images, and temporary files"""
     
-    def __init__(self) -> None:
+    def __init__(self, autocommit: bool = True) -> None:
+        """Set up storage; with autocommit=False registry changes wait for flush()"""
         self.config = get_service(Config)
         self.models_file: Path = self.config.models_dir / 'models.json'
         self.outputs_dir: Path = self.config.outputs_dir
         self.temp_dir: Path = self.config.temp_dir
         
-        # Load existing models registry
-        self._models: Dict[str, Dict[str, Any]] = self._load_models_registry()
+        # Directory listings reused by get_storage_stats while directories are unchanged
+        self._dir_cache: Dict[str, _DirListing] = {}
+        
+        self.autocommit = autocommit
+        self._dirty = False  # Registry changes not yet written
+        self._outer_autocommit: List[bool] = []
+    
+    @cached_property
+    def _models(self) -> Dict[str, Dict[str, Any]]:
+        """Models registry, loaded on first use so storage-only callers never read it"""
+        return self._load_models_registry()
+    
+    def __enter__(self) -> 'StorageManager':
+        """Batch registry changes: they are written once, when the block exits"""
+        self._outer_autocommit.append(self.autocommit)
+        self.autocommit = False
+        return self
+    
+    def __exit__(self, *exc_info: Any) -> None:
+        self.autocommit = self._outer_autocommit.pop()
+        self.flush()
+    
+    def flush(self) -> None:
+        """Write pending models registry changes to disk"""
+        if self._dirty:
+            self._save_models_registry()
+            self._dirty = False
     
     def save_model(self, name: str, model_info: Dict[str, Any]) -> None:
         """Save model information to registry
@@ -30,7 +128,7 @@ class StorageManager:
             model_info: Model metadata including lora_url, trigger_word, etc.
         """
         self._models[name] = model_info
-        self._save_models_registry()
+        self._registry_changed()
     
     def load_model(self, name: str) -> Optional[Dict[str, Any]]:
         """Load model information from registry
@@ -43,13 +141,14 @@ class StorageManager:
         """
         return self._models.get(name)
     
-    def list_models(self) -> Dict[str, Dict[str, Any]]:
+    def list_models(self) -> Mapping[str, Dict[str, Any]]:
         """List all saved models
         
         Returns:
-            Dictionary of model name -> model info
+            Read-only live view of model name -> model info (not a snapshot: it
+            reflects later saves and deletes; copy it with dict() to keep one)
         """
-        return self._models.copy()
+        return types.MappingProxyType(self._models)
     
     def delete_model(self, name: str) -> bool:
         """Delete model from registry
@@ -62,7 +161,7 @@ class StorageManager:
         """
         if name in self._models:
             del self._models[name]
-            self._save_models_registry()
+            self._registry_changed()
             return True
         return False
     
@@ -79,15 +178,45 @@ class StorageManager:
         output_path = self.outputs_dir / filename
         
         # Download image
-        response = requests.get(image_url, stream=True)
-        response.raise_for_status()
-        
-        # Save to outputs directory
-        with open(output_path, 'wb') as f:
-            shutil.copyfileobj(response.raw, f)
+        response = _HTTP.get(image_url, stream=True, timeout=_DOWNLOAD_TIMEOUT)
+        try:
+            response.raise_for_status()
+            # Reading the raw stream skips requests' decoding; undo any Content-Encoding here
+            response.raw.decode_content = True
+            
+            # Save to outputs directory
+            with open(output_path, 'wb') as f:
+                # Reserve the whole file up front when the size is known (POSIX only);
+                # a compressed transfer's Content-Length is not the size on disk
+                length = int(response.headers.get('Content-Length') or 0)
+                if response.headers.get('Content-Encoding'):
+                    length = 0
+                if length and hasattr(os, 'posix_fallocate'):
+                    try:
+                        os.posix_fallocate(f.fileno(), 0, length)
+                    except OSError:
+                        pass  # Not supported by this filesystem
+                shutil.copyfileobj(response.raw, f, length=_DOWNLOAD_CHUNK_SIZE)
+                f.truncate()  # Drop any reserved space a short download didn't fill
+        finally:
+            # Hand the connection back to the session's pool
+            response.close()
         
         return str(output_path)
     
+    def save_generated_images(self, downloads: List[Tuple[str, str]]) -> List[str]:
+        """Download and save several generated images concurrently
+        
+        Args:
+            downloads: (image_url, filename) pairs
+        
+        Returns:
+            Paths to saved files, in the order given
+        """
+        if len(downloads) <= 1:
+            return [self.save_generated_image(url, filename) for url, filename in downloads]
+        return list(_DOWNLOAD_POOL.map(lambda download: self.save_generated_image(*download), downloads))
+    
     def create_temp_file(self, suffix: str = '') -> str:
         """Create a temporary file
         
@@ -97,19 +226,27 @@ class StorageManager:
         Returns:
             Path to temporary file
         """
-        temp_file = tempfile.NamedTemporaryFile(
-            suffix=suffix,
-            dir=self.temp_dir,
-            delete=False
-        )
-        temp_file.close()
-        return temp_file.name
+        # mkstemp creates the file without the wrapper object NamedTemporaryFile builds around it
+        fd, temp_path = tempfile.mkstemp(suffix=suffix, dir=self.temp_dir)
+        os.close(fd)
+        return temp_path
     
     def cleanup_temp_files(self) -> None:
         """Clean up all temporary files"""
-        if self.temp_dir.exists():
-            shutil.rmtree(self.temp_dir)
-            self.temp_dir.mkdir(parents=True, exist_ok=True)
+        # Empty the directory in place rather than removing and recreating it
+        try:
+            entries = os.scandir(self.temp_dir)
+        except FileNotFoundError:
+            return
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        shutil.rmtree(entry.path)
+                    else:
+                        os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass  # Already removed, e.g. by another process
     
     def get_timestamp(self) -> str:
         """Get current timestamp string for filenames
@@ -117,7 +254,7 @@ class StorageManager:
         Returns:
             Timestamp in format YYYYMMDD_HHMMSS
         """
-        return datetime.now().strftime('%Y%m%d_%H%M%S')
+        return time.strftime('%Y%m%d_%H%M%S')
     
     def get_storage_stats(self) -> Dict[str, Any]:
         """Get storage usage statistics
@@ -125,32 +262,70 @@ class StorageManager:
         Returns:
             Dictionary with storage info
         """
-        def get_dir_size(directory: Path) -> int:
-            """Calculate directory size in bytes"""
-            if not directory.exists():
-                return 0
-            return sum(f.stat().st_size for f in directory.rglob('*') if f.is_file())
+        storage_dir = self.config.storage_dir
+        outputs_size = _dir_size(self.outputs_dir, cache=self._dir_cache)
+        temp_size = _dir_size(self.temp_dir, cache=self._dir_cache)
+        
+        # Outputs and temp normally live inside the storage dir: reuse their sizes
+        # instead of walking them a second time for the total
+        nested = {Path(d): size for d, size in ((self.outputs_dir, outputs_size), (self.temp_dir, temp_size))
+                  if Path(storage_dir) in Path(d).parents}
+        total_size = (_dir_size(storage_dir, skip={str(d) for d in nested}, cache=self._dir_cache)
+                      + sum(nested.values()))
         
         return {
             'models_count': len(self._models),
-            'outputs_size_mb': get_dir_size(self.outputs_dir) / (1024 * 1024),
-            'temp_size_mb': get_dir_size(self.temp_dir) / (1024 * 1024),
-            'total_size_mb': get_dir_size(self.config.storage_dir) / (1024 * 1024),
+            'outputs_size_mb': outputs_size / (1024 * 1024),
+            'temp_size_mb': temp_size / (1024 * 1024),
+            'total_size_mb': total_size / (1024 * 1024),
         }
     
     def _load_models_registry(self) -> Dict[str, Dict[str, Any]]:
-        """Load models registry from JSON file"""
-        if self.models_file.exists():
-            try:
+        """Load models registry from JSON file, reusing the last parse while the file is unchanged"""
+        try:
+            stat = os.stat(self.models_file)
+        except OSError:
+            return {}
+        
+        key = str(self.models_file)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = _REGISTRY_CACHE.get(key)
+        if cached is not None and cached[0] == signature:
+            return dict(cached[1])
+        
+        try:
+            if orjson is not None and stat.st_size >= _REGISTRY_MMAP_THRESHOLD:
+                with open(self.models_file, 'rb') as f, \
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+                        memoryview(mapped) as view:
+                    models = orjson.loads(view)
+            elif orjson is not None:
+                models = orjson.loads(self.models_file.read_bytes())
+            else:
                 with open(self.models_file, 'r') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError):
-                # If file is corrupted, start with empty registry
-                pass
+                    models = json.load(f)
+        except (json.JSONDecodeError, IOError):  # orjson.JSONDecodeError subclasses json's
+            # If file is corrupted, start with empty registry
+            return {}
         
-        return {}
+        _REGISTRY_CACHE[key] = (signature, models)
+        return dict(models)
+    
+    def _registry_changed(self) -> None:
+        """Note a registry change, writing it now unless writes are being batched"""
+        self._dirty = True
+        if self.autocommit:
+            self.flush()
     
     def _save_models_registry(self) -> None:
         """Save models registry to JSON file"""
-        with open(self.models_file, 'w') as f:
-            json.dump(self._models, f, indent=2)
\ No newline at end of file
+        # Compact output: the registry is machine-read, and indentation only adds bytes
+        if orjson is not None:
+            data = orjson.dumps(self._models)
+        else:
+            data = json.dumps(self._models, separators=(',', ':')).encode()
+        
+        # Write beside the registry, then move into place so a crash never leaves it half-written
+        partial_path = self.models_file.with_suffix('.json.tmp')
+        partial_path.write_bytes(data)
+        os.replace(partial_path, self.models_file)
\ No newline at end of file
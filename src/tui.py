@@ -1,23 +1,81 @@
 """Terminal UI for browsing generation history with image thumbnails"""
 import os
 import sys
-import subprocess
-import tempfile
 import base64
+import hashlib
+from array import array
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
 from textual.app import App, ComposeResult
-from textual.containers import Horizontal, Vertical, ScrollableContainer
+from textual.containers import Horizontal, ScrollableContainer
 from textual.widgets import Input, Static, Footer, Header
 from textual.binding import Binding
-from textual.reactive import reactive
-from textual import on, events
+from textual.reactive import reactive, var
+from textual import on, events, work
+from textual.timer import Timer
+from textual.worker import get_current_worker
 
 from PIL import Image
-from fuzzywuzzy import fuzz, process
+from rich.markup import escape
+from rich.text import Text
+from rapidfuzz import fuzz, process
 
+from .config import Config
 from .database import DatabaseManager
+from .services import get_service
+from .ui_components import install_uvloop, open_image_externally
+
+
+# Block characters for thumbnails, and a table mapping each grayscale level to one
+_BLOCK_CHARS = ' ░▒▓█'
+_BLOCK_TABLE = [_BLOCK_CHARS[min(len(_BLOCK_CHARS) - 1, level // (256 // len(_BLOCK_CHARS)))]
+                for level in range(256)]
+
+
+# Size the thumbnail cache is trimmed back to, oldest entries first, when the browser starts
+_THUMBNAIL_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+
+def _thumbnail_cache_dir() -> Path:
+    """Directory holding cached thumbnails"""
+    return get_service(Config).temp_dir / 'thumbnail_cache'
+
+
+def _thumbnail_cache_path(image_path: str, variant: str) -> Path:
+    """Cache file for a thumbnail variant of an image, keyed by path and mtime so edits invalidate it"""
+    mtime_ns = os.stat(image_path).st_mtime_ns
+    key = hashlib.blake2b(f"{image_path}|{mtime_ns}|{variant}".encode(), digest_size=16).hexdigest()
+    cache_dir = _thumbnail_cache_dir()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir / f"{key}-{variant}"
+
+
+def _prune_thumbnail_cache(max_bytes: int = _THUMBNAIL_CACHE_MAX_BYTES) -> None:
+    """Delete the oldest cached thumbnails until the cache fits in max_bytes
+    
+    Entries for edited or deleted images are never looked up again, so without
+    trimming the cache only grows.
+    """
+    files = []
+    try:
+        with os.scandir(_thumbnail_cache_dir()) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+    except FileNotFoundError:
+        return
+    
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        total -= size
 
 
 class ImageWidget(Static):
@@ -29,25 +87,37 @@ class ImageWidget(Static):
         self.thumbnail_width = width
         self.thumbnail_height = height
         self.thumbnail_path = None
+        self._rendered = False
+        self.update("[dim]…[/dim]")
         
-    def on_mount(self):
-        """Create and display thumbnail when widget mounts"""
-        if Path(self.image_path).exists():
+    def on_show(self):
+        """Render the thumbnail if the widget was laid out inside the visible area"""
+        self.render_if_visible()
+    
+    def render_if_visible(self):
+        """Create and display the thumbnail the first time the widget is scrolled into view"""
+        if self._rendered or not self.screen.can_view_partial(self):
+            return
+        self._rendered = True
+        if os.path.exists(self.image_path):
             self.create_thumbnail()
             self.display_image()
     
     def create_thumbnail(self):
         """Create a thumbnail version of the image"""
         try:
-            with Image.open(self.image_path) as img:
-                # Calculate thumbnail size maintaining aspect ratio
-                img.thumbnail((200, 150), Image.Resampling.LANCZOS)
-                
-                # Save thumbnail to temp file
-                temp_file = tempfile.NamedTemporaryFile(suffix='.jpg', delete=False)
-                img.save(temp_file.name, 'JPEG', quality=85)
-                self.thumbnail_path = temp_file.name
-                
+            thumbnail_path = _thumbnail_cache_path(self.image_path, '200x150.jpg')
+            if not thumbnail_path.exists():
+                with Image.open(self.image_path) as img:
+                    # Calculate thumbnail size maintaining aspect ratio
+                    img.thumbnail((200, 150), Image.Resampling.LANCZOS)
+                    
+                    # Write beside the cache entry, then move into place so readers never see a partial file
+                    partial_path = thumbnail_path.with_suffix('.part')
+                    img.convert('RGB').save(partial_path, 'JPEG', quality=85)
+                    os.replace(partial_path, thumbnail_path)
+            self.thumbnail_path = str(thumbnail_path)
+        
         except Exception as e:
             self.update(f"[red]Error loading image: {e}[/red]")
     
@@ -57,12 +127,15 @@ class ImageWidget(Static):
             return
             
         try:
+            # Truecolor terminals with inline image support get a colour thumbnail
+            if self.supports_inline_images():
+                self.create_color_thumbnail()
             # Check if we're in Alacritty or compatible terminal
-            if self.is_alacritty():
+            elif self.is_alacritty():
                 self.display_alacritty_image()
             else:
                 # Fallback to ASCII representation
-                self.update(f"[dim]📷 {Path(self.image_path).name}[/dim]")
+                self.update(f"[dim]📷 {os.path.basename(self.image_path)}[/dim]")
         except Exception as e:
             self.update(f"[red]Display error: {e}[/red]")
     
@@ -70,6 +143,10 @@ class ImageWidget(Static):
         """Check if running in Alacritty terminal"""
         return os.environ.get('TERM_PROGRAM') == 'alacritty' or 'alacritty' in os.environ.get('TERM', '').lower()
     
+    def supports_inline_images(self) -> bool:
+        """Check if running in Kitty or iTerm2"""
+        return 'kitty' in os.environ.get('TERM', '').lower() or os.environ.get('TERM_PROGRAM') == 'iTerm.app'
+    
     def display_alacritty_image(self):
         """Display image using terminal image protocols"""
         try:
@@ -79,38 +156,76 @@ class ImageWidget(Static):
             
         except Exception:
             # Fallback if image protocol fails
-            self.update(f"[dim]🖼️  {Path(self.image_path).name}[/dim]")
+            self.update(f"[dim]🖼️  {os.path.basename(self.image_path)}[/dim]")
     
     def create_ascii_thumbnail(self):
         """Create a simple ASCII representation of the image"""
         try:
-            with Image.open(self.image_path) as img:
+            filename = os.path.basename(self.image_path)
+            cache_path = _thumbnail_cache_path(self.image_path, '24x12.txt')
+            if cache_path.exists():
+                ascii_str = cache_path.read_text(encoding='utf-8')
+                self.update(f"[dim]{ascii_str}[/dim]\n[cyan]{filename}[/cyan]")
+                return
+            
+            with Image.open(self.thumbnail_path) as img:
                 # Convert to grayscale and resize to small dimensions
                 img = img.convert('L')
                 img = img.resize((24, 12), Image.Resampling.LANCZOS)
                 
-                # Convert to ASCII using Unicode block characters
-                pixels = list(img.getdata())
+                # Convert to Unicode block characters in one pass over the raw grayscale bytes
                 width, height = img.size
-                
-                ascii_art = []
-                chars = ' ░▒▓█'  # Characters from light to dark
-                
-                for y in range(height):
-                    row = ""
-                    for x in range(width):
-                        pixel = pixels[y * width + x]
-                        char_index = min(len(chars) - 1, pixel // (256 // len(chars)))
-                        row += chars[char_index]
-                    ascii_art.append(row)
+                blocks = img.tobytes().decode('latin-1').translate(_BLOCK_TABLE)
+                ascii_art = [blocks[y * width:(y + 1) * width] for y in range(height)]
                 
                 # Display ASCII art with filename
                 ascii_str = '\n'.join(ascii_art)
-                filename = Path(self.image_path).name
+                partial_path = cache_path.with_suffix('.part')
+                partial_path.write_text(ascii_str, encoding='utf-8')
+                os.replace(partial_path, cache_path)
                 self.update(f"[dim]{ascii_str}[/dim]\n[cyan]{filename}[/cyan]")
                 
         except Exception as e:
-            self.update(f"[red]Error: {e}[/red]\n[dim]{Path(self.image_path).name}[/dim]")
+            self.update(f"[red]Error: {e}[/red]\n[dim]{os.path.basename(self.image_path)}[/dim]")
+    
+    def create_color_thumbnail(self):
+        """Create a 24-bit colour half-block representation of the image
+        
+        Textual owns the screen, so raw Kitty/iTerm2 graphics escapes can't be written
+        through it; half blocks keep the colour and still render inside the layout.
+        """
+        try:
+            filename = escape(os.path.basename(self.image_path))
+            cache_path = _thumbnail_cache_path(self.image_path, '24x12.ans')
+            if cache_path.exists():
+                ansi_str = cache_path.read_text(encoding='utf-8')
+            else:
+                with Image.open(self.thumbnail_path) as img:
+                    # Two pixel rows per character row
+                    img = img.convert('RGB').resize((24, 24), Image.Resampling.LANCZOS)
+                    pixels = img.tobytes()
+                
+                row_bytes = 24 * 3
+                lines = []
+                for y in range(0, 24, 2):
+                    top = pixels[y * row_bytes:(y + 1) * row_bytes]
+                    bottom = pixels[(y + 1) * row_bytes:(y + 2) * row_bytes]
+                    # Upper half block: foreground is the top pixel, background the bottom one
+                    lines.append("".join(
+                        f"\x1b[38;2;{top[i]};{top[i + 1]};{top[i + 2]};48;2;{bottom[i]};{bottom[i + 1]};{bottom[i + 2]}m▀"
+                        for i in range(0, row_bytes, 3)
+                    ) + "\x1b[0m")
+                
+                ansi_str = '\n'.join(lines)
+                partial_path = cache_path.with_suffix('.part')
+                partial_path.write_text(ansi_str, encoding='utf-8')
+                os.replace(partial_path, cache_path)
+            
+            self.update(Text.from_ansi(ansi_str) + Text.from_markup(f"\n[cyan]{filename}[/cyan]"))
+        
+        except Exception:
+            # Fall back to the grayscale block rendering
+            self.create_ascii_thumbnail()
 
 
 class GenerationItem(Static):
@@ -125,6 +240,23 @@ class GenerationItem(Static):
         """Build the generation item layout"""
         gen = self.generation
         
+        # Cards are rebuilt on every search; the text only changes when the data is reloaded
+        text = gen.get('_card_text')
+        if text is None:
+            text = gen['_card_text'] = self.card_text(gen)
+        
+        # Only rows with an image need the side-by-side layout
+        if gen['success'] and gen['image_paths']:
+            image_path = gen['image_paths'][0]  # Show first image
+            with Horizontal():
+                yield ImageWidget(image_path)
+                yield Static(text, classes="generation-details")
+        else:
+            yield Static(text, classes="generation-details")
+    
+    @staticmethod
+    def card_text(gen: Dict[str, Any]) -> str:
+        """Markup for a generation's header, prompt and image count"""
         # Format timestamp
         timestamp = gen['timestamp'][:19].replace('T', ' ')
         status = "✅" if gen['success'] else "❌"
@@ -139,22 +271,11 @@ class GenerationItem(Static):
         if gen['generation_time']:
             details += f" | {gen['generation_time']:.2f}s"
         
-        with Horizontal():
-            # Image thumbnail (if available)
-            if gen['success'] and gen['image_paths']:
-                image_path = gen['image_paths'][0]  # Show first image
-                yield ImageWidget(image_path)
-            else:
-                yield Static("[dim]No image[/dim]", classes="no-image")
-            
-            # Text details
-            with Vertical():
-                yield Static(details, classes="generation-header")
-                yield Static(f'"{gen["prompt"]}"', classes="generation-prompt")
-                
-                if gen['image_paths'] and len(gen['image_paths']) > 1:
-                    yield Static(f"[dim]+ {len(gen['image_paths'])-1} more images[/dim]", 
-                               classes="image-count")
+        # Header, prompt and image count share one Static (blank lines stand in for margins)
+        text = f"[bold cyan]{escape(details)}[/bold cyan]\n\n\"{escape(gen['prompt'])}\""
+        if gen['image_paths'] and len(gen['image_paths']) > 1:
+            text += f"\n\n[dim]+ {len(gen['image_paths'])-1} more images[/dim]"
+        return text
     
     def on_click(self, event: events.Click):
         """Handle click to open image"""
@@ -167,21 +288,14 @@ class GenerationItem(Static):
         if not (self.generation['success'] and self.generation['image_paths']):
             return
             
-        image_path = Path(self.generation['image_paths'][0])
-        if not image_path.exists():
-            return
-        
-        try:
-            import platform
-            system = platform.system()
-            if system == "Darwin":  # macOS
-                subprocess.run(["open", str(image_path)])
-            elif system == "Windows":
-                subprocess.run(["start", str(image_path)], shell=True)
-            else:  # Linux
-                subprocess.run(["xdg-open", str(image_path)])
-        except Exception:
-            pass
+        open_image_externally(self.generation['image_paths'][0])
+
+
+# Generation cards mounted at a time; more are mounted as the list nears its end
+RESULTS_PAGE_SIZE = 30
+
+# Seconds the search input must be idle before the results are filtered
+SEARCH_DEBOUNCE = 0.15
 
 
 class GenerationBrowser(App):
@@ -199,25 +313,18 @@ class GenerationBrowser(App):
         background: $boost;
     }
     
-    .generation-header {
-        color: $accent;
-        text-style: bold;
-    }
-    
-    .generation-prompt {
-        color: $text;
-        margin-top: 1;
+    .generation-item Horizontal {
+        height: auto;
     }
     
-    .image-count {
-        margin-top: 1;
+    .generation-item ImageWidget {
+        width: auto;
+        margin-right: 2;
     }
     
-    .no-image {
-        width: 20;
-        height: 10;
-        content-align: center middle;
-        background: $surface;
+    .generation-details {
+        width: 1fr;
+        color: $text;
     }
     
     #search-input {
@@ -237,13 +344,19 @@ class GenerationBrowser(App):
     ]
     
     search_query = reactive("")
-    generations = reactive(list)
-    filtered_generations = reactive(list)
+    # Nothing renders straight from these, so assigning them needn't repaint; always_update
+    # skips comparing a freshly loaded list against the old one item by item
+    generations = var(list, always_update=True)
+    filtered_generations = var(lambda: array('i'), always_update=True)  # Indexes into generations
     
-    def __init__(self):
+    def __init__(self, db: Optional[DatabaseManager] = None):
         super().__init__()
-        self.db = DatabaseManager()
-        self.load_generations()
+        self.db = db or DatabaseManager()
+        self._mounted_count = 0  # Leading filtered generations that have cards mounted
+        self._shown_generations: Optional[array] = None  # Filtered indexes the cards were built for
+        self._filter_timer: Optional[Timer] = None
+        self._data_version: Optional[Tuple[int, ...]] = None
+        self._prompts_lower: List[str] = []
     
     def compose(self) -> ComposeResult:
         """Build the main UI layout"""
@@ -256,72 +369,129 @@ class GenerationBrowser(App):
     def on_mount(self):
         """Initialize the UI after mounting"""
         self.title = "Nano Banana - Generation History"
-        self.sub_title = f"{len(self.generations)} generations"
-        self.refresh_results()
+        self.watch(self.query_one("#results-container"), "scroll_y", self._on_results_scrolled, init=False)
+        self.load_generations()
+        self._prune_thumbnails()
+    
+    @work(thread=True, group="prune", exit_on_error=False)
+    def _prune_thumbnails(self):
+        """Trim the thumbnail cache off the event loop (best effort - a failure is ignored)"""
+        _prune_thumbnail_cache()
     
     def load_generations(self):
-        """Load all generations from database"""
+        """Load all generations from database in a worker thread, then show them"""
+        self._load_worker()
+    
+    @work(thread=True, exclusive=True, group="load")
+    def _load_worker(self):
+        """Query generations off the event loop; a newer load cancels an older one"""
+        data_version = self.db.data_version()
         try:
-            self.generations = self.db.search_generations(limit=1000, success_only=False)
-            self.filtered_generations = self.generations.copy()
+            generations = self.db.search_generations(limit=1000, success_only=False)
         except Exception as e:
-            self.generations = []
-            self.filtered_generations = []
+            generations = []
+        # Search matches case-insensitively; fold each prompt once per load, not per keystroke
+        prompts_lower = [gen['prompt'].lower() for gen in generations]
+        if not get_current_worker().is_cancelled:
+            self.call_from_thread(self._apply_generations, data_version, generations, prompts_lower)
+    
+    def _apply_generations(self, data_version: Tuple[int, ...], generations: List[Dict[str, Any]],
+                           prompts_lower: List[str]):
+        """Show freshly loaded generations (runs on the UI thread)"""
+        with self.batch_update():
+            self._data_version = data_version
+            self.generations = generations
+            self._prompts_lower = prompts_lower
+            self._shown_generations = None  # Same indexes may now be different records
+            self.filter_generations()
     
     @on(Input.Changed, "#search-input")
     def on_search_changed(self, event: Input.Changed):
-        """Handle search input changes"""
+        """Handle search input changes, filtering once typing pauses"""
+        if event.value == self.search_query:
+            return  # Already filtered, e.g. by action_clear_search
         self.search_query = event.value
-        self.filter_generations()
+        if self._filter_timer is not None:
+            self._filter_timer.stop()
+        self._filter_timer = self.set_timer(SEARCH_DEBOUNCE, self.filter_generations)
     
     def filter_generations(self):
         """Filter generations based on search query using fuzzy search"""
+        if self._filter_timer is not None:
+            self._filter_timer.stop()  # Superseded by this pass
+            self._filter_timer = None
         if not self.search_query.strip():
-            self.filtered_generations = self.generations.copy()
+            self.filtered_generations = array('i', range(len(self.generations)))
         else:
-            # Use fuzzy search on prompts
+            # Use fuzzy search on prompts, scoring them all in one native call
             query = self.search_query.strip().lower()
-            matches = []
+            matches = process.extract(query, self._prompts_lower, scorer=fuzz.partial_ratio,
+                                      score_cutoff=50, limit=None)
             
-            for gen in self.generations:
-                prompt = gen['prompt'].lower()
-                # Calculate fuzzy match score
-                score = fuzz.partial_ratio(query, prompt)
-                if score > 50:  # Threshold for fuzzy match
-                    matches.append((score, gen))
-            
-            # Sort by match score (descending)
-            matches.sort(key=lambda x: x[0], reverse=True)
-            self.filtered_generations = [match[1] for match in matches]
+            # Matches come sorted by score (descending); keep those above the threshold
+            self.filtered_generations = array('i', [index for _, score, index in matches if score > 50])
         
         self.refresh_results()
     
     def refresh_results(self):
         """Refresh the results display"""
-        container = self.query_one("#results-container")
-        container.remove_children()
-        
-        if not self.filtered_generations:
-            if self.search_query:
-                container.mount(Static("No generations match your search.", classes="no-results"))
-            else:
-                container.mount(Static("No generations found.", classes="no-results"))
+        # A query change that matches the same generations keeps the cards (and scroll position)
+        if self.filtered_generations and self.filtered_generations == self._shown_generations:
+            self.update_subtitle()
             return
+        self._shown_generations = self.filtered_generations
         
-        # Display filtered generations
-        for gen in self.filtered_generations:
-            container.mount(GenerationItem(gen))
+        # Swap the old cards for the new ones in a single screen update
+        with self.batch_update():
+            container = self.query_one("#results-container")
+            container.remove_children()
+            container.scroll_home(animate=False, immediate=True)
+            self._mounted_count = 0
+            
+            if not self.filtered_generations:
+                if self.search_query:
+                    container.mount(Static("No generations match your search.", classes="no-results"))
+                else:
+                    container.mount(Static("No generations found.", classes="no-results"))
+            else:
+                # Display the first page of filtered generations; the rest mount on scroll
+                self._mount_next_page()
         
-        # Update subtitle with count
+        self.update_subtitle()
+    
+    def update_subtitle(self):
+        """Update the subtitle with current counts"""
         if self.search_query:
             self.sub_title = f"{len(self.filtered_generations)} of {len(self.generations)} generations (searching: '{self.search_query}')"
         else:
             self.sub_title = f"{len(self.generations)} generations"
     
+    def _mount_next_page(self):
+        """Mount cards for the next page of filtered generations"""
+        page = self.filtered_generations[self._mounted_count:self._mounted_count + RESULTS_PAGE_SIZE]
+        if page:
+            self.query_one("#results-container").mount_all(
+                [GenerationItem(self.generations[index]) for index in page])
+            self._mounted_count += len(page)
+    
+    def _on_results_scrolled(self, scroll_y: float):
+        """Mount more cards once the view comes within a screen of the last mounted one"""
+        container = self.query_one("#results-container")
+        if container.max_scroll_y and scroll_y >= container.max_scroll_y - container.size.height:
+            self._mount_next_page()
+        # Let the layout settle, then render thumbnails that scrolled into view
+        self.call_after_refresh(self._render_visible_thumbnails)
+    
+    def _render_visible_thumbnails(self):
+        """Render thumbnails of cards now on screen that haven't been drawn yet"""
+        for image in self.query(ImageWidget):
+            image.render_if_visible()
+    
     def action_refresh(self):
-        """Reload data from database"""
+        """Reload data from database, unless nothing was written since the last load"""
+        if self.db.data_version() == self._data_version:
+            return
         self.load_generations()
-        self.filter_generations()
     
     def action_clear_search(self):
         """Clear search input"""
@@ -335,7 +505,8 @@ class GenerationBrowser(App):
         self.exit()
 
 
-def run_history_browser():
+def run_history_browser(db: Optional[DatabaseManager] = None):
     """Run the generation history browser TUI"""
-    app = GenerationBrowser()
+    install_uvloop()
+    app = GenerationBrowser(db)
     app.run()
\ No newline at end of file
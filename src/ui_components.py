@@ -1,206 +1,254 @@
 """Shared UI components for TUI interfaces"""
 import os
+import platform
 import subprocess
-import shutil
-from pathlib import Path
-from typing import Optional, Dict, Any
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Dict, Any, Tuple
 from rich.text import Text
 
-from textual.widgets import Static, ListItem, Label
+from textual import work
+from textual.content import Content
+from textual.widgets import Static
+from textual.worker import get_current_worker
 from PIL import Image
 
 
+# Preview cache key: (image path, mtime in nanoseconds, width, height)
+_PreviewKey = Tuple[str, int, int, int]
+
+# Rendered previews as immutable Content (displayed without re-parsing), least recently used first
+_PREVIEW_CACHE: "OrderedDict[_PreviewKey, Content]" = OrderedDict()
+_PREVIEW_CACHE_MAX = 64
+# Render workers insert and evict while the UI thread reads, so every access holds this lock
+_PREVIEW_CACHE_LOCK = threading.Lock()
+
+# ASCII characters from dark to light, and a byte table mapping each grayscale level to one
+_ASCII_CHARS = " .:-=+*#%@"
+_ASCII_TABLE = bytes(ord(_ASCII_CHARS[level * (len(_ASCII_CHARS) - 1) // 255]) for level in range(256))
+
+
+def _cache_preview(key: _PreviewKey, rendered: Content) -> None:
+    """Store a rendered preview, evicting the least recently used beyond capacity"""
+    with _PREVIEW_CACHE_LOCK:
+        _PREVIEW_CACHE[key] = rendered
+        if len(_PREVIEW_CACHE) > _PREVIEW_CACHE_MAX:
+            _PREVIEW_CACHE.popitem(last=False)
+
+
 class ImagePreviewWidget(Static):
     """Reusable image preview widget with high-quality terminal rendering"""
     
     def __init__(self, image_path: Optional[str] = None) -> None:
         super().__init__()
         self.image_path = image_path
+        self._last_rendered: Optional[str] = None  # Path of the image currently displayed
+        
+        # Renderers for images not in the preview cache, from best to last resort;
+        # each returns a renderable or None
+        self._renderers = (
+            self._render_half_block_preview,
+            self._render_ascii_preview,
+            self._render_placeholder,
+        )
         self.add_class("image-preview")
     
     def update_image(self, image_path: Optional[str]) -> None:
         """Update the displayed image"""
+        # Re-selecting the image already on display is a no-op
+        if image_path is not None and image_path == self._last_rendered:
+            return
         self.image_path = image_path
         self.refresh_display()
     
     def refresh_display(self) -> None:
-        """Refresh the image display using high-quality chafa rendering"""
-        if not self.image_path or not Path(self.image_path).exists():
+        """Refresh the image display, rendering uncached images in a worker thread"""
+        self._last_rendered = None
+        try:
+            mtime = os.stat(self.image_path).st_mtime_ns if self.image_path else None
+        except OSError:
+            mtime = None
+        if mtime is None:
             self.update("[dim]No image selected[/dim]")
             return
         
+        key = (self.image_path, mtime, 50, 25)
+        filename = os.path.basename(self.image_path)
+        
+        cached = self._render_cached(key)
+        if cached is not None:
+            self._show_rendered(key, cached)
+        elif not self.is_attached:
+            # Not running in an app (no worker support) - render inline
+            self._show_rendered(key, *self._render_safely(key, filename))
+        else:
+            self.update("[dim]Loading…[/dim]")
+            self._render_worker(key, filename)
+    
+    @work(thread=True, exclusive=True, group="preview", exit_on_error=False)
+    def _render_worker(self, key: _PreviewKey, filename: str) -> None:
+        """Render a preview off the UI thread; a newer selection cancels older renders"""
+        rendered, success = self._render_safely(key, filename)
+        if not get_current_worker().is_cancelled:
+            self.app.call_from_thread(self._show_rendered, key, rendered, success)
+    
+    def _render_safely(self, key: _PreviewKey, filename: str) -> Tuple[Any, bool]:
+        """Run the renderers in order, returning (renderable, whether it shows the image)"""
         try:
-            filename = Path(self.image_path).name
-            chafa_output = self._get_chafa_output(self.image_path, width=50, height=25)
+            decoded: List[Optional[Image.Image]] = []
             
-            if chafa_output:
-                # Use Rich Text to properly render ANSI escape sequences
-                rich_text = Text.from_ansi(chafa_output)
-                self.update(rich_text.append(f"\n\n{filename}"))
-            else:
-                # Fallback to ASCII art
-                ascii_art = self._generate_ascii_art(self.image_path, width=50, height=25)
-                if ascii_art:
-                    self.update(f"{ascii_art}\n\n{filename}")
-                else:
-                    self.update(f"📷 {filename}")
-                
+            def load_image() -> Optional[Image.Image]:
+                # Decode at most once, shared by the renderers
+                if not decoded:
+                    decoded.append(self._load_preview_image(key[0], width=key[2]))
+                return decoded[0]
+            
+            for render in self._renderers:
+                rendered = render(key, filename, load_image)
+                if rendered is not None:
+                    return rendered, True
+            return None, False
         except Exception as e:
-            self.update(f"[red]Preview error: {e}[/red]")
+            return f"[red]Preview error: {e}[/red]", False
+    
+    def _show_rendered(self, key: _PreviewKey, rendered: Any, success: bool = True) -> None:
+        """Display a rendering, unless another image has been selected since"""
+        if self.image_path != key[0]:
+            return
+        self.update(rendered)
+        if success:
+            self._last_rendered = key[0]
+    
+    def _render_cached(self, key: _PreviewKey) -> Any:
+        """Reuse the rendering of an unchanged image"""
+        with _PREVIEW_CACHE_LOCK:
+            cached = _PREVIEW_CACHE.get(key)
+            if cached is not None:
+                _PREVIEW_CACHE.move_to_end(key)
+        return cached
+    
+    def _render_half_block_preview(self, key: _PreviewKey, filename: str,
+                                   load_image: Callable[[], Optional[Image.Image]]) -> Any:
+        """Render the image as colour half blocks"""
+        img = load_image()
+        ansi_output = self._render_half_blocks(img) if img else None
+        if not ansi_output:
+            return None
+        
+        # Parse the ANSI escape sequences once; the cached Content is shown as is
+        rendered = Content.from_rich_text(Text.from_ansi(ansi_output)).append(f"\n\n{filename}")
+        _cache_preview(key, rendered)
+        return rendered
+    
+    def _render_ascii_preview(self, key: _PreviewKey, filename: str,
+                              load_image: Callable[[], Optional[Image.Image]]) -> Any:
+        """Render the image as ASCII art"""
+        img = load_image()
+        ascii_art = self._generate_ascii_art(img, height=key[3]) if img else None
+        if not ascii_art:
+            return None
+        
+        rendered = Content(f"{ascii_art}\n\n{filename}")
+        _cache_preview(key, rendered)
+        return rendered
+    
+    def _render_placeholder(self, key: _PreviewKey, filename: str,
+                            load_image: Callable[[], Optional[Image.Image]]) -> Any:
+        """Show just the file name"""
+        return f"📷 {filename}"
     
-    def _get_chafa_output(self, image_path: str, width: int = 50, height: int = 25) -> Optional[str]:
-        """Get chafa output using high-quality settings optimized for terminal display"""
+    def _load_preview_image(self, image_path: str, width: int = 50) -> Optional[Image.Image]:
+        """Decode an image once, scaled to the preview width with its aspect ratio kept
+        
+        The result has one pixel row per half character row, ready for either renderer.
+        """
         try:
-            # Calculate height maintaining aspect ratio
             with Image.open(image_path) as img:
                 aspect_ratio = img.height / img.width
-                height = int(width * aspect_ratio * 0.5)  # Terminal character aspect ratio
-            
-            # Use chafa with optimized settings for Textual compatibility
-            if shutil.which('chafa'):
-                cmd = [
-                    'chafa',
-                    '--size', f'{width}x{height}',
-                    '--colors=256',          # Use 256 colors for better compatibility
-                    '--format=symbols',      # Use symbols format for better terminal support
-                    image_path
-                ]
+                height = max(2, round(width * aspect_ratio))
                 
-                try:
-                    # Set environment variables for proper color rendering
-                    env = os.environ.copy()
-                    env['TERM'] = os.environ.get('TERM', 'xterm-256color')
-                    env['COLORTERM'] = os.environ.get('COLORTERM', 'truecolor')
-                    
-                    result = subprocess.run(
-                        cmd, 
-                        capture_output=True, 
-                        text=True, 
-                        check=True, 
-                        timeout=3, 
-                        env=env
-                    )
-                    
-                    output = result.stdout.strip()
-                    if output and not self._contains_raw_escape_codes(output):
-                        return output
-                        
-                except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
-                    pass
+                # Let JPEG decoding downscale by a power of two while it decodes
+                img.draft('RGB', (width * 2, height * 2))
+                img = img.convert('RGB')
             
+            if img.width > width:
+                img.thumbnail((width, height), Image.Resampling.LANCZOS)
+            if img.size != (width, height):
+                img = img.resize((width, height), Image.Resampling.LANCZOS)
+            return img
+        
+        except Exception:
             return None
+    
+    def _render_half_blocks(self, img: Image.Image) -> Optional[str]:
+        """Render an RGB image as 24-bit ANSI half blocks (two pixel rows per character row)"""
+        try:
+            width = img.width
+            height = img.height // 2  # Terminal character aspect ratio
+            pixels = img.tobytes()
+            
+            row_bytes = width * 3
+            lines = []
+            for y in range(height):
+                top = pixels[2 * y * row_bytes:(2 * y + 1) * row_bytes]
+                bottom = pixels[(2 * y + 1) * row_bytes:(2 * y + 2) * row_bytes]
+                # Upper half block: foreground is the top pixel, background the bottom one
+                lines.append("".join(
+                    f"\x1b[38;2;{top[i]};{top[i + 1]};{top[i + 2]};48;2;{bottom[i]};{bottom[i + 1]};{bottom[i + 2]}m▀"
+                    for i in range(0, row_bytes, 3)
+                ) + "\x1b[0m")
+            
+            return "\n".join(lines)
             
         except Exception:
             return None
     
-    def _contains_raw_escape_codes(self, text: str) -> bool:
-        """Check if text contains raw escape sequences that won't display properly"""
-        if len(text) < 10:
-            return False
-        
-        # Check for very long sequences of just numbers and semicolons (raw escape codes)
-        first_line = text.split('\n')[0] if '\n' in text else text[:50]
-        
-        # Count display characters vs control characters
-        display_chars = sum(1 for c in first_line if c.isalpha() or c in ' ░▒▓█▄▀■□▲▼►◄')
-        numeric_chars = sum(1 for c in first_line if c.isdigit() or c in ';:')
-        
-        # If there are very few display characters and lots of numbers, it's likely raw codes
-        return numeric_chars > 20 and display_chars < 3
-    
-    def _generate_ascii_art(self, image_path: str, width: int = 50, height: int = 25) -> Optional[str]:
-        """Generate ASCII art fallback for image display"""
+    def _generate_ascii_art(self, img: Image.Image, height: int = 25) -> Optional[str]:
+        """Generate ASCII art fallback for an image already scaled to the preview width"""
         try:
-            # ASCII characters from dark to light
-            chars = " .:-=+*#%@"
+            width = img.width
+            height = min(height, img.height // 2)  # Character aspect ratio
             
-            with Image.open(image_path) as img:
-                # Convert to grayscale and resize
-                img = img.convert('L')
-                
-                # Calculate height maintaining aspect ratio
-                aspect_ratio = img.height / img.width
-                calculated_height = int(width * aspect_ratio * 0.5)  # Character aspect ratio
-                height = min(height, calculated_height)
-                
-                img = img.resize((width, height))
-                
-                # Convert to ASCII
-                ascii_lines = []
-                for y in range(height):
-                    line = ""
-                    for x in range(width):
-                        pixel = img.getpixel((x, y))
-                        char_index = int(pixel * (len(chars) - 1) / 255)
-                        line += chars[char_index]
-                    ascii_lines.append(line)
-                
-                return '\n'.join(ascii_lines)
+            # Convert to grayscale and resize
+            img = img.convert('L').resize((width, height), Image.Resampling.BILINEAR)
+            
+            # Convert to ASCII in one pass over the raw grayscale bytes
+            ascii_bytes = img.tobytes().translate(_ASCII_TABLE)
+            ascii_lines = [ascii_bytes[y * width:(y + 1) * width].decode('ascii') for y in range(height)]
+            
+            return '\n'.join(ascii_lines)
                 
         except Exception:
             return None
 
 
-class GenerationListItem(ListItem):
-    """Reusable list item for generation history display"""
+def generation_label(generation: Dict[str, Any], show_model: bool = True) -> str:
+    """One-line list text for a generation"""
+    status = "✅" if generation['success'] else "❌"
     
-    def __init__(self, generation: Dict[str, Any], show_model: bool = True) -> None:
-        self.generation = generation
-        
-        # Format display text
-        timestamp = generation['timestamp'][:19].replace('T', ' ')
-        status = "✅" if generation['success'] else "❌"
-        
-        # Build display text
-        display_parts = [f"{status} [{generation['id']:3d}]"]
-        
-        if show_model:
-            model = generation['base_model']
-            if generation.get('finetuned_model'):
-                model += f" + LoRA"
-            display_parts.append(f"({model})")
-        
-        # Truncate long prompts
-        prompt = generation['prompt']
-        if len(prompt) > 50:
-            prompt = prompt[:47] + "..."
-        display_parts.append(prompt)
-        
-        display_text = " ".join(display_parts)
-        
-        super().__init__(Label(display_text))
-        self.add_class("generation-item")
-        
-        # Add status-specific styling
-        if generation['success']:
-            self.add_class("success")
-        else:
-            self.add_class("failed")
+    # Truncate long prompts
+    prompt = generation['prompt']
+    if len(prompt) > 50:
+        prompt = prompt[:47] + "..."
+    
+    if not show_model:
+        return f"{status} [{generation['id']:3d}] {prompt}"
+    
+    lora = " + LoRA" if generation.get('finetuned_model') else ""
+    return f"{status} [{generation['id']:3d}] ({generation['base_model']}{lora}) {prompt}"
 
 
-class SessionStepItem(ListItem):
-    """Reusable list item for session editing steps"""
+def step_label(step: Dict[str, Any], is_initial: bool = False) -> str:
+    """One-line list text for a session editing step"""
+    if is_initial:
+        return f"[0] Initial Image"
     
-    def __init__(self, step: Dict[str, Any], is_initial: bool = False) -> None:
-        self.step = step
-        self.is_initial = is_initial
-        
-        if is_initial:
-            display_text = f"[0] Initial Image"
-        else:
-            status = "✅" if step['success'] else "❌"
-            step_num = step['step_number']
-            prompt = step['prompt']
-            if len(prompt) > 45:
-                prompt = prompt[:42] + "..."
-            display_text = f"{status} [{step_num}] {prompt}"
-        
-        super().__init__(Label(display_text))
-        self.add_class("step-item")
-        
-        # Add styling for failed steps
-        if not is_initial and not step['success']:
-            self.add_class("failed")
+    status = "✅" if step['success'] else "❌"
+    step_num = step['step_number']
+    prompt = step['prompt']
+    if len(prompt) > 45:
+        prompt = prompt[:42] + "..."
+    return f"{status} [{step_num}] {prompt}"
 
 
 def format_generation_info(generation: Dict[str, Any]) -> str:
@@ -216,40 +264,49 @@ def format_generation_info(generation: Dict[str, Any]) -> str:
     if gen.get('finetuned_model'):
         model_info += f" + {gen['finetuned_model']}"
     
-    # Build info text
-    info_text = f"""[bold]Generation #{gen['id']}[/bold]
-
-[cyan]Prompt:[/cyan]
-{gen['prompt']}
-
-[yellow]Details:[/yellow]
-• Status: {status}
-• Model: {model_info}
-• Created: {timestamp}"""
+    # Build info text from lines, joined once at the end
+    lines = [
+        f"[bold]Generation #{gen['id']}[/bold]",
+        "",
+        "[cyan]Prompt:[/cyan]",
+        gen['prompt'],
+        "",
+        "[yellow]Details:[/yellow]",
+        f"• Status: {status}",
+        f"• Model: {model_info}",
+        f"• Created: {timestamp}",
+    ]
     
     # Add optional details
     if gen.get('generation_time'):
-        info_text += f"\n• Duration: {gen['generation_time']:.2f}s"
+        lines.append(f"• Duration: {gen['generation_time']:.2f}s")
     
     if gen.get('steps'):
-        info_text += f"\n• Steps: {gen['steps']}"
+        lines.append(f"• Steps: {gen['steps']}")
     
     if gen.get('image_size'):
-        info_text += f"\n• Size: {gen['image_size']}"
+        lines.append(f"• Size: {gen['image_size']}")
     
     # Image information
     if gen.get('image_paths'):
         if len(gen['image_paths']) == 1:
-            image_name = Path(gen['image_paths'][0]).name
-            info_text += f"\n• Image: {image_name}"
+            image_name = os.path.basename(gen['image_paths'][0])
+            lines.append(f"• Image: {image_name}")
         else:
-            info_text += f"\n• Images: {len(gen['image_paths'])} files"
+            lines.append(f"• Images: {len(gen['image_paths'])} files")
     
     # Error details
     if not gen['success'] and gen.get('error_message'):
-        info_text += f"\n\n[red]Error:[/red]\n{gen['error_message']}"
+        lines += ["", "[red]Error:[/red]", gen['error_message']]
     
-    return info_text
+    return "\n".join(lines)
+
+
+def _step_filename(step: Dict[str, Any]) -> str:
+    """File name of a step's image, using the name precomputed by the session editor if present"""
+    if '_filename' in step:
+        return step['_filename']
+    return os.path.basename(step['image_path'])
 
 
 def format_step_info(step: Dict[str, Any]) -> str:
@@ -258,7 +315,7 @@ def format_step_info(step: Dict[str, Any]) -> str:
         return f"""[bold]Initial Image[/bold]
 
 [yellow]File:[/yellow]
-{Path(step['image_path']).name}
+{_step_filename(step)}
 
 [yellow]Path:[/yellow]
 {step['image_path']}
@@ -266,24 +323,29 @@ def format_step_info(step: Dict[str, Any]) -> str:
 [cyan]Instructions:[/cyan]
 Type your edit prompt above and press Enter to create the next step."""
     else:
-        info_text = f"""[bold]Step {step['step_number']}[/bold]
-
-[cyan]Prompt:[/cyan]
-{step['prompt']}
-
-[yellow]Status:[/yellow]
-{"✅ Success" if step['success'] else "❌ Failed"}
-
-[yellow]File:[/yellow]
-{Path(step['image_path']).name}"""
+        sections = [
+            f"[bold]Step {step['step_number']}[/bold]",
+            f"[cyan]Prompt:[/cyan]\n{step['prompt']}",
+            f"[yellow]Status:[/yellow]\n{'✅ Success' if step['success'] else '❌ Failed'}",
+            f"[yellow]File:[/yellow]\n{_step_filename(step)}",
+        ]
         
         if step.get('generation_time'):
-            info_text += f"\n\n[yellow]Generation Time:[/yellow]\n{step['generation_time']:.2f} seconds"
+            sections.append(f"[yellow]Generation Time:[/yellow]\n{step['generation_time']:.2f} seconds")
         
         if step.get('error_message'):
-            info_text += f"\n\n[red]Error:[/red]\n{step['error_message']}"
+            sections.append(f"[red]Error:[/red]\n{step['error_message']}")
         
-        return info_text
+        return "\n\n".join(sections)
+
+
+# Default image viewer launch commands per platform (the image path is appended)
+_OPEN_COMMANDS = {
+    "Darwin": ["open"],
+    "Windows": ["cmd", "/c", "start", ""],
+    "Linux": ["xdg-open"],
+}
+_OPEN_COMMAND = _OPEN_COMMANDS.get(platform.system(), _OPEN_COMMANDS["Linux"])
 
 
 def open_image_externally(image_path: str) -> bool:
@@ -295,25 +357,38 @@ def open_image_externally(image_path: str) -> bool:
     Returns:
         True if successful, False otherwise
     """
-    if not Path(image_path).exists():
+    if not os.path.exists(image_path):
         return False
     
     try:
-        import platform
-        system = platform.system()
-        
-        if system == "Darwin":  # macOS
-            os.system(f"open '{image_path}'")
-        elif system == "Windows":
-            os.system(f"start '{image_path}'")
-        else:  # Linux
-            os.system(f"xdg-open '{image_path}'")
-        
+        # Launch the viewer without a shell and without waiting for it to exit
+        subprocess.Popen(
+            _OPEN_COMMAND + [str(image_path)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
         return True
     except Exception:
         return False
 
 
+def install_uvloop() -> None:
+    """Use uvloop for Textual's asyncio event loop when it is installed (optional)
+    
+    Without it (e.g. on Windows, which uvloop doesn't support) the default loop is kept.
+    """
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+
+
+# Seconds a list highlight must stay put before its row is selected and rendered
+SELECTION_DEBOUNCE = 0.15
+
+
 # Common CSS styles for TUI applications
 COMMON_TUI_CSS = """
 .image-preview {
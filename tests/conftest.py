@@ -19,8 +19,12 @@ def temp_dir():
 
 @pytest.fixture
 def mock_config(temp_dir):
-    """Mock configuration with temporary directories"""
-    config = Mock(spec=Config)
+    """Configuration with temporary directories
+    
+    A real Config (its __init__ skipped) with plain attributes, so lookups don't go
+    through Mock's __getattr__ machinery.
+    """
+    config = Config.__new__(Config)
     config.storage_dir = temp_dir / "storage"
     config.models_dir = temp_dir / "models"  
     config.outputs_dir = temp_dir / "outputs"
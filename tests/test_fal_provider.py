@@ -0,0 +1,256 @@
+"""Tests for the FAL provider"""
+import os
+from unittest.mock import patch
+
+import pytest
+
+from src.providers.base import GenerationRequest
+from src.providers.fal_provider import (
+    FALProvider, UPLOAD_CACHE_TTL, _FAL_MODELS, _hash_file, _resolve_route
+)
+
+
+class FakeSyncClient:
+    """Records FAL calls in place of fal_client.SyncClient"""
+    
+    def __init__(self):
+        self.calls = []
+        self.uploads = []
+    
+    def subscribe(self, endpoint, arguments, with_logs=False):
+        self.calls.append((endpoint, arguments))
+        return {'images': [{'url': 'https://fal.media/out.jpg'}], 'seed': 42}
+    
+    def upload_file(self, path):
+        self.uploads.append(path)
+        return f"https://fal.media/upload/{os.path.basename(path)}"
+
+
+@pytest.fixture
+def provider():
+    """FAL provider wired to a fake client"""
+    provider = FALProvider(api_key="test-key")
+    provider._client = FakeSyncClient()
+    return provider
+
+
+@pytest.fixture
+def reference_image(tmp_path):
+    """A small reference image file"""
+    path = tmp_path / "reference.jpg"
+    path.write_bytes(b"reference image bytes")
+    return str(path)
+
+
+def generate(provider, **kwargs):
+    """Run a generation and return the (endpoint, arguments) sent to FAL"""
+    result = provider.generate_image(GenerationRequest(**kwargs))
+    assert result.success, result.error_message
+    return provider._client.calls[-1]
+
+
+class TestRouting:
+    """Test cases for model routing and argument mapping"""
+    
+    @pytest.mark.parametrize("model_name,endpoint", [
+        ("flux-dev", "fal-ai/flux/dev"),
+        ("flux-schnell", "fal-ai/flux/schnell"),
+        ("nano-banana", "fal-ai/gemini-25-flash-image"),
+    ])
+    def test_endpoint_without_references(self, provider, model_name, endpoint):
+        """Test the text-to-image endpoint of each model"""
+        sent_endpoint, arguments = generate(provider, prompt="a cat", model_name=model_name)
+        
+        assert sent_endpoint == endpoint
+        assert arguments['prompt'] == "a cat"
+        assert arguments['num_images'] == 1
+    
+    @pytest.mark.parametrize("model_name,endpoint", [
+        ("flux-dev", "fal-ai/flux/dev"),
+        ("flux-schnell", "fal-ai/flux/schnell"),
+    ])
+    def test_flux_ignores_references(self, provider, reference_image, model_name, endpoint):
+        """Test that Flux models keep their endpoint and upload nothing"""
+        sent_endpoint, arguments = generate(provider, prompt="a cat", model_name=model_name,
+                                            reference_images=[reference_image])
+        
+        assert sent_endpoint == endpoint
+        assert "image_urls" not in arguments
+        assert provider._client.uploads == []
+    
+    def test_nano_banana_edit_receives_uploaded_urls(self, provider, tmp_path, reference_image):
+        """Test that nano-banana switches to its edit endpoint with uploaded image URLs"""
+        second_image = tmp_path / "second.jpg"
+        second_image.write_bytes(b"other image bytes")
+        
+        sent_endpoint, arguments = generate(provider, prompt="a cat", model_name="nano-banana",
+                                            reference_images=[reference_image, str(second_image)])
+        
+        assert sent_endpoint == "fal-ai/gemini-25-flash-image/edit"
+        assert arguments == {
+            "prompt": "a cat",
+            "num_images": 1,
+            "image_urls": ["https://fal.media/upload/reference.jpg", "https://fal.media/upload/second.jpg"],
+        }
+        assert sorted(provider._client.uploads) == sorted([reference_image, str(second_image)])
+    
+    def test_every_model_has_a_route(self):
+        """Test that each advertised model resolves with and without references"""
+        for model in _FAL_MODELS:
+            assert _resolve_route(model.name, False).endpoint
+            assert _resolve_route(model.name, True).endpoint
+    
+    @pytest.mark.parametrize("model_name,requested,sent", [
+        ("flux-dev", 80, 50),
+        ("flux-dev", 30, 30),
+        ("flux-schnell", 28, 4),
+    ])
+    def test_steps_clamped(self, provider, model_name, requested, sent):
+        """Test that inference steps are capped at each model's limit"""
+        _, arguments = generate(provider, prompt="a cat", model_name=model_name, steps=requested)
+        
+        assert arguments['num_inference_steps'] == sent
+    
+    def test_unset_optional_arguments_omitted(self, provider):
+        """Test that unset steps, guidance, seed and LoRA aren't sent"""
+        _, arguments = generate(provider, prompt="a cat", model_name="flux-dev")
+        
+        for name in ("num_inference_steps", "guidance_scale", "seed", "loras"):
+            assert name not in arguments
+    
+    def test_optional_arguments_passed(self, provider):
+        """Test that guidance scale and seed are passed through when set"""
+        _, arguments = generate(provider, prompt="a cat", model_name="flux-dev",
+                                guidance_scale=2.5, seed=7)
+        
+        assert arguments['guidance_scale'] == 2.5
+        assert arguments['seed'] == 7
+    
+    def test_lora_passthrough(self, provider):
+        """Test that a fine-tuned model becomes a LoRA argument"""
+        _, arguments = generate(provider, prompt="a cat", model_name="flux-dev",
+                                fine_tuned_model="https://fal.media/lora.safetensors")
+        
+        assert arguments['loras'] == [{"path": "https://fal.media/lora.safetensors", "scale": 1.0}]
+    
+    def test_image_size_mapping(self, provider):
+        """Test that explicit dimensions map to WxH and missing ones to the default size"""
+        _, arguments = generate(provider, prompt="a cat", model_name="flux-dev", width=768, height=512)
+        assert arguments['image_size'] == "768x512"
+        
+        _, arguments = generate(provider, prompt="a cat", model_name="flux-dev", width=0, height=0)
+        assert arguments['image_size'] == "landscape_16_9"
+    
+    def test_nano_banana_caps_num_images(self, provider):
+        """Test that nano-banana requests at most four images"""
+        _, arguments = generate(provider, prompt="a cat", model_name="nano-banana", num_images=6)
+        
+        assert arguments['num_images'] == 4
+    
+    def test_unknown_model_raises(self):
+        """Test that an unknown model is rejected"""
+        with pytest.raises(ValueError, match="Unknown model: sdxl"):
+            _resolve_route("sdxl", False)
+    
+    def test_unknown_model_fails_generation(self, provider):
+        """Test that generating with an unknown model returns a failed result without calling FAL"""
+        result = provider.generate_image(GenerationRequest(prompt="a cat", model_name="sdxl"))
+        
+        assert not result.success
+        assert "Unknown model: sdxl" in result.error_message
+        assert provider._client.calls == []
+
+
+@pytest.fixture
+def db_provider(mock_config):
+    """FAL provider with a fake client and a real upload cache database"""
+    from src.config import Config
+    from src.database import DatabaseManager
+    from src.services import register_service
+    
+    register_service(Config, mock_config)
+    provider = FALProvider(api_key="test-key", db_manager=DatabaseManager())
+    provider._client = FakeSyncClient()
+    return provider
+
+
+class TestUploadCache:
+    """Test cases for content-hash upload reuse"""
+    
+    def test_identical_content_reuses_url(self, db_provider, tmp_path):
+        """Test that a second file with the same bytes isn't uploaded again"""
+        first, second = tmp_path / "first.jpg", tmp_path / "second.jpg"
+        first.write_bytes(b"same image bytes")
+        second.write_bytes(b"same image bytes")
+        
+        first_url = db_provider._upload_cached(str(first))
+        second_url = db_provider._upload_cached(str(second))
+        
+        assert second_url == first_url
+        assert db_provider._client.uploads == [str(first)]
+    
+    def test_upload_reused_across_providers(self, db_provider, reference_image):
+        """Test that the database remembers uploads for later provider instances"""
+        url = db_provider._upload_cached(reference_image)
+        
+        fresh = FALProvider(api_key="test-key", db_manager=db_provider.db_manager)
+        fresh._client = FakeSyncClient()
+        
+        assert fresh._upload_cached(reference_image) == url
+        assert fresh._client.uploads == []
+    
+    def test_unchanged_file_not_rehashed(self, db_provider, reference_image):
+        """Test that the hash is reused while size and mtime are unchanged"""
+        with patch('src.providers.fal_provider._hash_file', wraps=_hash_file) as mock_hash:
+            db_provider._file_hash(reference_image)
+            db_provider._file_hash(reference_image)
+        
+        assert mock_hash.call_count == 1
+    
+    def test_touched_file_rehashed(self, db_provider, reference_image):
+        """Test that a new mtime rehashes, and unchanged content still reuses the upload"""
+        db_provider._upload_cached(reference_image)
+        stat = os.stat(reference_image)
+        os.utime(reference_image, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        
+        with patch('src.providers.fal_provider._hash_file', wraps=_hash_file) as mock_hash:
+            db_provider._upload_cached(reference_image)
+        
+        assert mock_hash.call_count == 1
+        assert db_provider._client.uploads == [reference_image]
+    
+    def test_changed_content_uploaded_again(self, db_provider, reference_image):
+        """Test that rewriting the file with new bytes uploads it again"""
+        db_provider._upload_cached(reference_image)
+        with open(reference_image, 'wb') as f:
+            f.write(b"edited image bytes, a different length")
+        
+        db_provider._upload_cached(reference_image)
+        
+        assert db_provider._client.uploads == [reference_image, reference_image]
+    
+    def test_expired_upload_uploaded_again(self, db_provider, reference_image):
+        """Test that an upload older than the TTL isn't reused"""
+        import sqlite3
+        
+        db_provider._upload_cached(reference_image)
+        
+        # Age the upload past the TTL in memory and in the database
+        content_hash = db_provider._file_hash(reference_image)
+        url, uploaded_at = db_provider._upload_urls[content_hash]
+        db_provider._upload_urls[content_hash] = (url, uploaded_at - UPLOAD_CACHE_TTL - 1)
+        with sqlite3.connect(db_provider.db_manager.db_path) as conn:
+            conn.execute("UPDATE uploads SET uploaded_at = uploaded_at - ?", (UPLOAD_CACHE_TTL + 1,))
+        
+        db_provider._upload_cached(reference_image)
+        
+        assert db_provider._client.uploads == [reference_image, reference_image]
+    
+    def test_hash_matches_sha256(self, reference_image):
+        """Test that the chunked hash equals a one-shot SHA-256"""
+        import hashlib
+        
+        with open(reference_image, 'rb') as f:
+            expected = hashlib.sha256(f.read()).hexdigest()
+        
+        assert _hash_file(reference_image, chunk_size=4) == expected
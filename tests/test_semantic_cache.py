@@ -0,0 +1,190 @@
+"""Tests for the semantic prompt cache"""
+import itertools
+import json
+from unittest.mock import patch
+
+import pytest
+
+from src.providers.semantic_cache import SemanticCache, SENTENCE_MODEL
+
+
+class StubEmbedder:
+    """Stands in for a sentence-transformers model with fixed unit vectors per prompt"""
+    
+    def __init__(self, vectors):
+        self.vectors = vectors
+    
+    def encode(self, text, normalize_embeddings=True):
+        return self.vectors[text]
+
+
+def with_embedder(cache: SemanticCache, embedder) -> SemanticCache:
+    """Install an embedder (or None for the exact-match fallback) without loading a model"""
+    cache._model = embedder
+    cache._model_loaded = True
+    return cache
+
+
+IMAGES = [{"url": "https://example.com/a.jpg", "path": ""}]
+
+
+class TestExactMatchFallback:
+    """Test cases for the cache without sentence-transformers"""
+    
+    def test_identical_prompt_hits_after_normalizing(self):
+        """Test that case, whitespace and punctuation differences still hit"""
+        cache = with_embedder(SemanticCache(), None)
+        cache.insert("A red hat", "k", IMAGES, seed=7)
+        
+        hit = cache.lookup("  a RED hat! ", "k")
+        
+        assert hit is not None
+        assert hit['images'] == IMAGES
+        assert hit['seed'] == 7
+    
+    @pytest.mark.parametrize("prompt", ["a blue hat", "a red hat and a scarf", "not a red hat"])
+    def test_different_prompt_misses(self, prompt):
+        """Test that lexically similar but different prompts never hit"""
+        cache = with_embedder(SemanticCache(), None)
+        cache.insert("a red hat", "k", IMAGES)
+        
+        assert cache.lookup(prompt, "k") is None
+    
+    def test_embedder_name(self):
+        """Test that the fallback is named apart from real embedders"""
+        assert with_embedder(SemanticCache(), None).embedder_name == "exact-prompt"
+
+
+class TestSimilarityThreshold:
+    """Test cases for the cache with an embedder"""
+    
+    @pytest.fixture
+    def cache(self):
+        embedder = StubEmbedder({
+            "stored": [1.0, 0.0],
+            "close": [0.95, 0.3122498999],   # cosine 0.95 with "stored"
+            "far": [0.8, 0.6],               # cosine 0.80 with "stored"
+        })
+        return with_embedder(SemanticCache(threshold=0.92), embedder)
+    
+    def test_similar_prompt_hits(self, cache):
+        """Test that a prompt above the threshold is served from the cache"""
+        cache.insert("stored", "k", IMAGES)
+        
+        hit = cache.lookup("close", "k")
+        
+        assert hit is not None
+        assert hit['prompt'] == "stored"
+    
+    def test_dissimilar_prompt_misses(self, cache):
+        """Test that a prompt below the threshold misses"""
+        cache.insert("stored", "k", IMAGES)
+        
+        assert cache.lookup("far", "k") is None
+    
+    def test_embedder_name(self, cache):
+        """Test that the model name tags persisted embeddings"""
+        assert cache.embedder_name == SENTENCE_MODEL
+
+
+class TestParamsKey:
+    """Test cases for parameter isolation"""
+    
+    def test_other_params_key_misses(self):
+        """Test that an identical prompt with different parameters misses"""
+        cache = with_embedder(SemanticCache(), None)
+        cache.insert("a red hat", "flux-dev|1", IMAGES)
+        
+        assert cache.lookup("a red hat", "flux-schnell|1") is None
+        assert cache.lookup("a red hat", "flux-dev|1") is not None
+
+
+class TestExpiry:
+    """Test cases for entry TTL"""
+    
+    def test_expired_entry_misses_on_lookup(self):
+        """Test that an entry older than the TTL is not served"""
+        cache = with_embedder(SemanticCache(ttl=60), None)
+        cache.insert("a red hat", "k", IMAGES)
+        cache._entries[0]['created'] -= 61
+        
+        assert cache.lookup("a red hat", "k") is None
+    
+    def test_expired_entry_dropped_on_load(self, tmp_path):
+        """Test that expired entries in the index file are discarded when loading"""
+        index_path = tmp_path / "semantic_cache.json"
+        entry = {
+            'prompt': "a red hat", 'normalized': "a red hat", 'params_key': "k",
+            'embedding': None, 'images': IMAGES, 'seed': None,
+        }
+        index_path.write_text(json.dumps({'embedder': "exact-prompt", 'entries': [
+            {**entry, 'created': 0, 'last_used': 0},
+        ]}))
+        
+        cache = with_embedder(SemanticCache(index_path=index_path, ttl=60), None)
+        
+        assert cache.lookup("a red hat", "k") is None
+        assert cache._entries == []
+
+
+class TestEviction:
+    """Test cases for the entry limit"""
+    
+    def test_least_recently_used_entry_evicted(self):
+        """Test that the entry used longest ago is dropped beyond max_entries"""
+        cache = with_embedder(SemanticCache(max_entries=2), None)
+        
+        with patch('src.providers.semantic_cache.time') as mock_time:
+            mock_time.time.side_effect = itertools.count(1000)
+            mock_time.monotonic.return_value = 0.0
+            cache.insert("first", "k", IMAGES)
+            cache.insert("second", "k", IMAGES)
+            assert cache.lookup("first", "k") is not None  # "second" is now least recently used
+            cache.insert("third", "k", IMAGES)
+            
+            assert len(cache._entries) == 2
+            assert cache.lookup("second", "k") is None
+            assert cache.lookup("first", "k") is not None
+            assert cache.lookup("third", "k") is not None
+
+
+class TestPersistence:
+    """Test cases for saving and reloading the index"""
+    
+    def test_flush_and_reload_round_trip(self, tmp_path):
+        """Test that flushed entries are served by a fresh cache instance"""
+        index_path = tmp_path / "semantic_cache.json"
+        cache = with_embedder(SemanticCache(index_path=index_path), None)
+        cache.insert("a red hat", "k", IMAGES, seed=3)
+        cache.insert("a blue hat", "k", IMAGES, seed=4)
+        cache.flush()
+        
+        reloaded = with_embedder(SemanticCache(index_path=index_path), None)
+        
+        assert reloaded.lookup("a red hat", "k")['seed'] == 3
+        assert reloaded.lookup("a blue hat", "k")['seed'] == 4
+        assert [p.name for p in tmp_path.iterdir()] == ["semantic_cache.json"]
+    
+    def test_writes_are_debounced(self, tmp_path):
+        """Test that inserts in quick succession are written together on flush"""
+        index_path = tmp_path / "semantic_cache.json"
+        cache = with_embedder(SemanticCache(index_path=index_path), None)
+        cache.insert("a red hat", "k", IMAGES)
+        cache.insert("a blue hat", "k", IMAGES)
+        
+        assert len(json.loads(index_path.read_text())['entries']) == 1
+        
+        cache.flush()
+        
+        assert len(json.loads(index_path.read_text())['entries']) == 2
+    
+    def test_index_from_other_embedder_ignored(self, tmp_path):
+        """Test that entries embedded by a different embedder are discarded"""
+        index_path = tmp_path / "semantic_cache.json"
+        cache = with_embedder(SemanticCache(index_path=index_path), None)
+        cache.insert("a red hat", "k", IMAGES)
+        cache.flush()
+        
+        other = with_embedder(SemanticCache(index_path=index_path), StubEmbedder({"a red hat": [1.0, 0.0]}))
+        
+        assert other.lookup("a red hat", "k") is None
@@ -55,6 +55,17 @@ class TestServiceLocator:
         with pytest.raises(ValueError):
             get_service(MockService)
     
+    def test_reregister_service_replaces_instance(self) -> None:
+        """Test that re-registering a service replaces the previous instance"""
+        clear_services()
+        first, second = MockService("first"), MockService("second")
+        
+        register_service(MockService, first)
+        assert get_service(MockService) is first
+        
+        register_service(MockService, second)
+        assert get_service(MockService) is second
+    
     @patch('src.config.Config')
     @patch('src.storage.StorageManager')  
     @patch('src.database.DatabaseManager')
@@ -124,6 +135,26 @@ class TestServiceLocator:
             # Should still be initialized
             assert is_initialized()
     
+    def test_initialize_services_concurrent(self) -> None:
+        """Test that concurrent first calls only initialize services once"""
+        clear_services()
+        import threading
+        
+        with patch('src.config.Config') as mock_config, \
+             patch('src.storage.StorageManager'), \
+             patch('src.database.DatabaseManager'), \
+             patch('src.image_preview.ImagePreview'), \
+             patch('src.fal_wrapper.FALWrapper', side_effect=ValueError):
+            
+            threads = [threading.Thread(target=initialize_services) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            
+            assert is_initialized()
+            assert mock_config.call_count == 1
+    
     def test_get_fal_client_available(self) -> None:
         """Test getting FAL client when available"""
         clear_services()
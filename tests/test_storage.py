@@ -1,6 +1,5 @@
 """Tests for storage manager"""
 import json
-import tempfile
 from pathlib import Path
 from unittest.mock import Mock, patch, MagicMock
 import pytest
@@ -10,32 +9,32 @@ from src.storage import StorageManager
 
 
 @pytest.fixture
-def temp_storage():
-    """Create temporary storage directory for testing"""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir)
-        
-        # Create a real config instance with temp directory
-        from src.services import register_service
-        from src.config import Config
-        
-        # Patch Config's __init__ to use temp directory
-        with patch.object(Config, '__init__', lambda self: None):
-            config = Config()
-            config.models_dir = temp_path / "models"
-            config.outputs_dir = temp_path / "outputs" 
-            config.temp_dir = temp_path / "temp"
-            config.storage_dir = temp_path
-            
-            # Create directories
-            config.models_dir.mkdir(parents=True, exist_ok=True)
-            config.outputs_dir.mkdir(parents=True, exist_ok=True)
-            config.temp_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Register the test config
-            register_service(Config, config)
-            
-            yield StorageManager()
+def temp_storage(tmp_path):
+    """Create temporary storage directory for testing
+    
+    Uses pytest's tmp_path, which is pruned a few runs later rather than deleted
+    tree by tree after every test.
+    """
+    # Create a real config instance with temp directory
+    from src.services import register_service
+    from src.config import Config
+    
+    # Skip Config's __init__ (no patching needed) and point it at the temp directory
+    config = Config.__new__(Config)
+    config.models_dir = tmp_path / "models"
+    config.outputs_dir = tmp_path / "outputs" 
+    config.temp_dir = tmp_path / "temp"
+    config.storage_dir = tmp_path
+    
+    # Create directories
+    config.models_dir.mkdir(parents=True, exist_ok=True)
+    config.outputs_dir.mkdir(parents=True, exist_ok=True)
+    config.temp_dir.mkdir(parents=True, exist_ok=True)
+    
+    # Register the test config
+    register_service(Config, config)
+    
+    yield StorageManager()
 
 
 class TestStorageManager:
@@ -109,7 +108,7 @@ class TestStorageManager:
         result = storage.delete_model("nonexistent")
         assert result is False
     
-    @patch('src.storage.requests.get')
+    @patch('src.storage._HTTP.get')
     def test_save_generated_image(self, mock_get, temp_storage):
         """Test downloading and saving generated images"""
         storage = temp_storage
@@ -118,6 +117,7 @@ class TestStorageManager:
         mock_response = Mock()
         mock_response.raise_for_status.return_value = None
         mock_response.raw = MagicMock()
+        mock_response.headers = {}
         mock_get.return_value = mock_response
         
         with patch('src.storage.shutil.copyfileobj') as mock_copyfile:
@@ -129,7 +129,7 @@ class TestStorageManager:
             expected_path = str(storage.outputs_dir / "test_image.jpg")
             assert image_path == expected_path
             
-            mock_get.assert_called_once_with("https://example.com/image.jpg", stream=True)
+            mock_get.assert_called_once_with("https://example.com/image.jpg", stream=True, timeout=(10, 30))
             mock_response.raise_for_status.assert_called_once()
             mock_copyfile.assert_called_once()
     
@@ -152,6 +152,9 @@ class TestStorageManager:
         test_file2 = storage.temp_dir / "test2.txt"
         test_file1.write_text("test")
         test_file2.write_text("test")
+        nested_file = storage.temp_dir / "thumbnail_cache" / "thumb.jpg"
+        nested_file.parent.mkdir()
+        nested_file.write_text("test")
         
         # Files exist
         assert test_file1.exists()
@@ -164,6 +167,7 @@ class TestStorageManager:
         assert storage.temp_dir.exists()
         assert not test_file1.exists()
         assert not test_file2.exists()
+        assert list(storage.temp_dir.iterdir()) == []
     
     def test_get_timestamp(self, temp_storage):
         """Test timestamp generation"""
@@ -194,6 +198,19 @@ class TestStorageManager:
         assert stats['models_count'] == 1
         assert stats['outputs_size_mb'] >= 0
     
+    def test_get_storage_stats_sees_new_files(self, temp_storage):
+        """Test that cached directory sizes are refreshed when files are added"""
+        storage = temp_storage
+        
+        (storage.outputs_dir / "first.jpg").write_bytes(b"x" * 1024)
+        first = storage.get_storage_stats()
+        
+        (storage.outputs_dir / "second.jpg").write_bytes(b"x" * 2048)
+        second = storage.get_storage_stats()
+        
+        assert second['outputs_size_mb'] * 1024 * 1024 == pytest.approx(3072)
+        assert second['total_size_mb'] - first['total_size_mb'] == pytest.approx(2048 / (1024 * 1024))
+    
     def test_models_registry_persistence(self, temp_storage):
         """Test that model registry persists to disk"""
         storage = temp_storage
@@ -226,4 +243,92 @@ class TestStorageManager:
         new_storage.temp_dir = storage.temp_dir
         new_storage._models = new_storage._load_models_registry()
         
-        assert new_storage._models == {}  # Should start with empty registry
\ No newline at end of file
+        assert new_storage._models == {}  # Should start with empty registry
+    
+    def test_models_registry_without_orjson(self, temp_storage):
+        """Test that the registry round-trips through the stdlib json fallback"""
+        storage = temp_storage
+        
+        with patch('src.storage.orjson', None):
+            storage.save_model("fallback_model", {"url": "test"})
+            reloaded = storage._load_models_registry()
+        
+        assert reloaded["fallback_model"] == {"url": "test"}
+        # Files written either way are plain JSON
+        assert json.loads(storage.models_file.read_text()) == reloaded
+    
+    def test_models_registry_parse_is_reused_until_file_changes(self, temp_storage):
+        """Test that unchanged registries aren't re-parsed and edited ones are"""
+        storage = temp_storage
+        storage.save_model("cached_model", {"url": "test"})
+        
+        first = storage._load_models_registry()
+        with patch('src.storage.orjson') as mock_orjson, patch('src.storage.json.load') as mock_load:
+            second = storage._load_models_registry()
+            mock_orjson.loads.assert_not_called()
+            mock_load.assert_not_called()
+        assert second == first and second is not first
+        
+        # Rewriting the file with different contents invalidates the cached parse
+        storage.models_file.write_text(json.dumps({"edited_model": {"url": "new"}}))
+        assert list(storage._load_models_registry()) == ["edited_model"]
+    
+    def test_models_registry_save_leaves_no_partial_file(self, temp_storage):
+        """Test that registry saves are moved into place rather than left beside it"""
+        storage = temp_storage
+        
+        storage.save_model("atomic_model", {"url": "test"})
+        
+        assert json.loads(storage.models_file.read_text()) == {"atomic_model": {"url": "test"}}
+        assert list(storage.models_file.parent.iterdir()) == [storage.models_file]
+    
+    def test_batched_model_saves_write_once(self, temp_storage):
+        """Test that registry changes inside a with block are written once on exit"""
+        storage = temp_storage
+        
+        with patch.object(storage, '_save_models_registry', wraps=storage._save_models_registry) as mock_save:
+            with storage:
+                storage.save_model("model1", {"url": "url1"})
+                storage.save_model("model2", {"url": "url2"})
+                storage.delete_model("model1")
+                assert not storage.models_file.exists()
+            
+            mock_save.assert_called_once()
+        
+        assert storage.autocommit is True
+        assert json.loads(storage.models_file.read_text()) == {"model2": {"url": "url2"}}
+    
+    def test_save_generated_images_keeps_order(self, temp_storage):
+        """Test that concurrent downloads return paths in the order requested"""
+        storage = temp_storage
+        downloads = [(f"https://example.com/{i}.jpg", f"image_{i}.jpg") for i in range(5)]
+        
+        with patch.object(storage, 'save_generated_image',
+                          side_effect=lambda url, filename: str(storage.outputs_dir / filename)) as mock_save:
+            paths = storage.save_generated_images(downloads)
+        
+        assert paths == [str(storage.outputs_dir / f"image_{i}.jpg") for i in range(5)]
+        assert mock_save.call_count == 5
+    
+    def test_large_models_registry_loads(self, temp_storage):
+        """Test that registries past the memory-map threshold load like small ones"""
+        storage = temp_storage
+        
+        registry = {f"model_{i}": {"url": f"https://example.com/{i}" * 20} for i in range(1000)}
+        storage.models_file.write_text(json.dumps(registry))
+        assert storage.models_file.stat().st_size >= 64 * 1024
+        
+        assert storage._load_models_registry() == registry
+    
+    def test_models_registry_loaded_on_first_use(self, temp_storage):
+        """Test that constructing a storage manager doesn't read the registry"""
+        temp_storage.save_model("lazy_model", {"url": "test"})
+        
+        with patch.object(StorageManager, '_load_models_registry', return_value={}) as mock_load:
+            storage = StorageManager()
+            storage.create_temp_file()
+            mock_load.assert_not_called()
+            
+            storage.list_models()
+            storage.load_model("lazy_model")
+            mock_load.assert_called_once()